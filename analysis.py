@@ -0,0 +1,112 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import evaluate
+from feedback import generate_feedback
+from utils import TranscriptAnalysis
+from batcher import coherence_batcher
+from grammar import check_sentences
+from models import get_grammar_tool
+from config import ANALYSIS_WORKERS
+
+# Shared by all jobs; stages are mostly I/O (LanguageTool) or torch ops that release the GIL
+_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+
+def _text_stage(ctx):
+    return TranscriptAnalysis(ctx["transcription"], ctx["timestamps"], ctx["language"])
+
+def _budget_stage(ctx):
+    # Settle the optional analysis work against the deadline before the expensive stages start
+    if ctx["plan"] is not None:
+        ctx["plan"].analysis(len(ctx["text"].sentences))
+    return ctx["plan"]
+
+def _matches_stage(ctx):
+    tool = get_grammar_tool(ctx["language"])
+    sentences = ctx["text"].sentences
+    if tool is None:
+        return None
+    limit = ctx["budget"].grammar_sentences if ctx["budget"] is not None else None
+    if limit is not None and limit < len(sentences):
+        # Degraded: unchecked sentences get no grammar feedback
+        return check_sentences(tool, sentences[:limit], ctx["language"]) + [[] for _ in sentences[limit:]]
+    return check_sentences(tool, sentences, ctx["language"])
+
+def _coherence_stage(ctx):
+    # Shares forward passes with other in-flight requests
+    sentences = ctx["text"].sentences
+    if ctx["budget"] is not None and not ctx["budget"].sentence_coherence:
+        # Degraded: only the overall score; 1.0 keeps feedback from flagging unscored sentences
+        return {"text": coherence_batcher([ctx["transcription"]])[0], "sentences": [1.0] * len(sentences)}
+    scores = coherence_batcher([ctx["transcription"]] + sentences)
+    return {"text": scores[0], "sentences": scores[1:]}
+
+def _fluency_stage(ctx):
+    return evaluate.fluency_score(ctx["timestamps"], ctx["language"], pauses=ctx["pauses"], analysis=ctx["text"])
+
+def _grammar_stage(ctx):
+    matches = ctx["matches"]
+    error_count = sum(len(m) for m in matches) if matches is not None else None
+    limit = ctx["budget"].grammar_sentences if ctx["budget"] is not None else None
+    if error_count is not None and limit is not None and 0 < limit < len(matches):
+        # Only the first sentences were checked; assume the same error rate for the rest
+        error_count = round(error_count * len(matches) / limit)
+    return evaluate.grammar_score(ctx["transcription"], ctx["language"], error_count=error_count,
+                                  coherence_score=ctx["coherence"]["text"], analysis=ctx["text"])
+
+def _vocabulary_stage(ctx):
+    return evaluate.vocab_score(ctx["transcription"], analysis=ctx["text"])
+
+def _pronunciation_stage(ctx):
+    return evaluate.pronunciation_score(ctx["timestamps"], ctx["language"], analysis=ctx["text"])
+
+def _feedback_stage(ctx):
+    matches = ctx["matches"]
+    if matches is None:
+        matches = [[] for _ in ctx["text"].sentences]
+    return generate_feedback(
+        ctx["transcription"], ctx["timestamps"], ctx["language"],
+        sentence_matches=matches,
+        sentence_coherence=ctx["coherence"]["sentences"],
+        pauses=ctx["pauses"],
+        analysis=ctx["text"]
+    )
+
+# name -> (function, dependencies); each stage reads its inputs from the shared context
+STAGES = {
+    "text": (_text_stage, []),
+    "budget": (_budget_stage, ["text"]),
+    "matches": (_matches_stage, ["budget"]),
+    "coherence": (_coherence_stage, ["budget"]),
+    "fluency": (_fluency_stage, ["text"]),
+    "grammar": (_grammar_stage, ["matches", "coherence"]),
+    "vocabulary": (_vocabulary_stage, ["text"]),
+    "pronunciation": (_pronunciation_stage, ["text"]),
+    "feedback": (_feedback_stage, ["matches", "coherence", "text"])
+}
+
+def _call(func, ctx):
+    start = time.perf_counter()
+    value = func(ctx)
+    return value, round(time.perf_counter() - start, 4)
+
+def run_graph(stages, ctx, timings, executor=_executor):
+    pending = dict(stages)
+    running = {}
+    while pending or running:
+        for name, (func, deps) in list(pending.items()):
+            if all(dep in ctx for dep in deps):
+                running[executor.submit(_call, func, ctx)] = name
+                del pending[name]
+        if not running:
+            raise ValueError(f"Unresolvable stage dependencies: {sorted(pending)}")
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            name = running.pop(future)
+            ctx[name], timings[name] = future.result()
+    return ctx
+
+def analyze(transcription, timestamps, language, timings, pauses=None, plan=None):
+    ctx = {"transcription": transcription, "timestamps": timestamps, "language": language, "pauses": pauses,
+           "plan": plan}
+    run_graph(STAGES, ctx, timings)
+    return ctx
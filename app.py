@@ -1,87 +1,162 @@
-
-import streamlit as st
-import requests
-import json
-import pandas as pd
-import altair as alt
-from datetime import datetime
-
-st.title("English Speaking Fluency Tester")
-
-# Language selector
-languages = {
-    "English": "en",
-    # "Mandarin Chinese": "zh",
-    # "Hindi": "hi",
-    # "Spanish": "es",
-    # "French": "fr",
-    # "Arabic": "ar",
-    # "Bengali": "bn",
-    # "Russian": "ru",
-    # "Portuguese": "pt",
-    # "Urdu": "ur"
-}
-selected_language = st.selectbox("Select Language", list(languages.keys()))
-language_code = languages[selected_language]
-
-# Audio input (file upload only)
-uploaded_file = st.file_uploader(f"Upload Audio in {selected_language}", type=["wav", "mp3", "mpeg"])
-
-if uploaded_file:
-    # Send to backend
-    files = {"file": ("audio.wav", uploaded_file, "audio/mpeg" if uploaded_file.name.endswith(".mpeg") else "audio/wav")}
-    data = {"language": language_code}
-    response = requests.post("http://localhost:8000/evaluate", files=files, data=data)
-    
-    if response.status_code == 200:
-        result = response.json()
-        
-        # Display scores
-        st.header("Results")
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Overall Band", result["band_score"])
-        col2.metric("Fluency", result["fluency"])
-        col3.metric("Grammar", result["grammar"])
-        col4.metric("Vocabulary", result["vocabulary"])
-        
-        # Display transcript
-        st.header("Transcript")
-        st.write(result["transcript"])
-        
-        # Display feedback
-        st.header("Detailed Feedback")
-        for fb in result["feedback"]:
-            with st.expander(f"{fb['area'].capitalize()} Issue at {fb['time']}"):
-                st.write(f"Issue: {fb['issue']}")
-                st.write(f"Suggestion: {fb['suggestion']}")
-        
-        # Display feedback table
-        st.header("All Feedback")
-        df_feedback = pd.DataFrame(result["feedback"])
-        st.table(df_feedback)
-        
-        # Display progress chart
-        st.header("Progress Over Time")
-        with open("../data/history.json", "r") as f:
-            history = json.load(f)
-        
-        df_history = pd.DataFrame(history)
-        df_history['timestamp'] = pd.to_datetime(df_history['timestamp'])
-        df_history = df_history[df_history['language'] == language_code]
-        chart = alt.Chart(df_history).mark_line().encode(
-            x=alt.X('timestamp:T', title='Date'),
-            y=alt.Y('band_score:Q', title='Band Score'),
-            tooltip=['timestamp', 'band_score', 'language']
-        ).properties(
-            width=600,
-            height=400
-        )
-        st.altair_chart(chart, use_container_width=True)
-
-
-
-
-
-
-
-
+
+import hashlib
+import time
+import streamlit as st
+import requests
+import pandas as pd
+import altair as alt
+from datetime import datetime
+
+API_URL = "http://localhost:8000"
+
+st.title("English Speaking Fluency Tester")
+
+# Language selector
+languages = {
+    "English": "en",
+    # "Mandarin Chinese": "zh",
+    # "Hindi": "hi",
+    # "Spanish": "es",
+    # "French": "fr",
+    # "Arabic": "ar",
+    # "Bengali": "bn",
+    # "Russian": "ru",
+    # "Portuguese": "pt",
+    # "Urdu": "ur"
+}
+selected_language = st.selectbox("Select Language", list(languages.keys()))
+language_code = languages[selected_language]
+
+# Audio input (file upload only)
+uploaded_file = st.file_uploader(f"Upload Audio in {selected_language}", type=["wav", "mp3", "mpeg"])
+
+# Evaluations survive reruns (widget clicks, expanders) in session state, keyed by file + language
+if "evaluations" not in st.session_state:
+    st.session_state["evaluations"] = {}
+evaluations = st.session_state["evaluations"]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_progress(language, period="day"):
+    # Average and best band score per day or week, aggregated by the backend
+    # An unreachable or failing server leaves the chart empty rather than breaking the page
+    try:
+        response = requests.get(f"{API_URL}/progress", params={"language": language, "period": period}, timeout=10)
+        points = response.json().get("points", []) if response.ok else []
+    except (requests.RequestException, ValueError):
+        points = []
+    df = pd.DataFrame(points,
+                      columns=["bucket", "tests", "band_mean", "band_best", "fluency", "grammar", "vocabulary",
+                               "pronunciation"])
+    df["bucket"] = pd.to_datetime(df["bucket"])
+    return df
+
+def submit(audio_bytes, name, language):
+    # Queue the evaluation and return immediately; the job is polled below
+    files = {"file": (name, audio_bytes, "audio/mpeg" if name.endswith((".mp3", ".mpeg")) else "audio/wav")}
+    try:
+        response = requests.post(f"{API_URL}/evaluate", files=files, data={"language": language}, timeout=(5, 60))
+    except requests.RequestException as e:
+        return {"status": "failed", "error": f"Could not reach the server: {e}"}
+    if response.status_code == 429:
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        body = {"error": f"Server error ({response.status_code})"}
+    if "job_id" not in body:
+        return {"status": "failed", "error": body.get("error", "Unexpected response")}
+    return {"job_id": body["job_id"], "status": body["status"], "submitted_at": time.time()}
+
+# Consecutive failed polls before the evaluation is given up on; waits between them back off
+MAX_POLL_FAILURES = 6
+
+def poll(evaluation):
+    # Short long-polls so the status line stays current; a rerun picks up the same job
+    failures = 0
+    with st.status("Evaluating your recording...", expanded=False) as status:
+        while evaluation["status"] in ("queued", "running"):
+            try:
+                job = requests.get(f"{API_URL}/jobs/{evaluation['job_id']}", params={"wait": 2}, timeout=10).json()
+                failures = 0
+            except (requests.RequestException, ValueError):
+                failures += 1
+                if failures >= MAX_POLL_FAILURES:
+                    job = {"status": "failed", "error": "Lost contact with the server, please try again"}
+                else:
+                    time.sleep(min(2 ** failures, 10))
+                    job = {"status": evaluation["status"]}
+            if job.get("error") == "Job not found":
+                job = {"status": "failed", "error": "The evaluation expired on the server, please upload again"}
+            evaluation["status"] = job.get("status", "failed")
+            evaluation["result"] = job.get("result")
+            evaluation["error"] = job.get("error")
+            elapsed = time.time() - evaluation["submitted_at"]
+            status.update(label=f"Evaluation {evaluation['status']} ({elapsed:.0f}s)")
+        if evaluation["status"] == "done":
+            status.update(label="Evaluation complete", state="complete")
+            load_progress.clear()  # The new result belongs in the chart
+        else:
+            status.update(label="Evaluation failed", state="error")
+
+result = None
+if uploaded_file:
+    audio_bytes = uploaded_file.getvalue()
+    key = f"{hashlib.sha256(audio_bytes).hexdigest()}:{language_code}"
+    if key not in evaluations:
+        evaluation = submit(audio_bytes, uploaded_file.name, language_code)
+        if evaluation is None:
+            st.warning("The server is busy right now. Please try again in a few seconds.")
+        else:
+            evaluations[key] = evaluation
+    evaluation = evaluations.get(key)
+    if evaluation is not None:
+        if evaluation["status"] in ("queued", "running"):
+            poll(evaluation)
+        if evaluation["status"] == "done":
+            result = evaluation["result"]
+        else:
+            st.error(f"Evaluation failed: {evaluation.get('error')}")
+            if st.button("Try again"):
+                del evaluations[key]
+                st.rerun()
+
+if result:
+    
+    # Display scores
+    st.header("Results")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Overall Band", result["band_score"])
+    col2.metric("Fluency", result["fluency"])
+    col3.metric("Grammar", result["grammar"])
+    col4.metric("Vocabulary", result["vocabulary"])
+    
+    # Display transcript
+    st.header("Transcript")
+    st.write(result["transcript"])
+    
+    # Display feedback
+    st.header("Detailed Feedback")
+    for fb in result["feedback"]:
+        with st.expander(f"{fb['area'].capitalize()} Issue at {fb['time']}"):
+            st.write(f"Issue: {fb['issue']}")
+            st.write(f"Suggestion: {fb['suggestion']}")
+    
+    # Display feedback table
+    st.header("All Feedback")
+    df_feedback = pd.DataFrame(result["feedback"])
+    st.table(df_feedback)
+    
+    # Display progress chart
+    st.header("Progress Over Time")
+    period = st.radio("Group by", ["day", "week"], horizontal=True, format_func=str.capitalize)
+    df_history = load_progress(language_code, period)
+    chart = alt.Chart(df_history).mark_line(point=True).encode(
+        x=alt.X('bucket:T', title='Date'),
+        y=alt.Y('band_mean:Q', title='Average Band Score'),
+        tooltip=[alt.Tooltip('bucket:T', title=period.capitalize()), alt.Tooltip('band_mean:Q', format='.1f'),
+                 'band_best', 'tests', 'fluency', 'grammar', 'vocabulary', 'pronunciation']
+    ).properties(
+        width=600,
+        height=400
+    )
+    st.altair_chart(chart, use_container_width=True)
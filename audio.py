@@ -0,0 +1,180 @@
+import struct
+import subprocess
+import threading
+import numpy as np
+from config import MAX_UPLOAD_BYTES, MAX_AUDIO_SECONDS
+
+# Whisper works on 16 kHz mono float32
+SAMPLE_RATE = 16000
+CHUNK_BYTES = 1 << 20
+
+class AudioTooLarge(Exception):
+    pass
+
+async def read_upload(file, max_bytes=MAX_UPLOAD_BYTES):
+    # Read the upload in chunks so oversized files are rejected before they are fully buffered
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise AudioTooLarge(f"Upload exceeds {max_bytes // (1 << 20)} MB limit")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+def _feed(stdin, data):
+    try:
+        for start in range(0, len(data), CHUNK_BYTES):
+            stdin.write(data[start:start + CHUNK_BYTES])
+    except (BrokenPipeError, ValueError):
+        pass  # ffmpeg was stopped early (duration cap)
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+def decode_audio(data, max_seconds=MAX_AUDIO_SECONDS):
+    # Decode any container ffmpeg understands straight to 16 kHz mono float32, in one pass
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"
+    ]
+    max_bytes = int(max_seconds * SAMPLE_RATE) * 4
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    feeder = threading.Thread(target=_feed, args=(process.stdin, data), daemon=True)
+    feeder.start()
+
+    buffer = bytearray()
+    try:
+        while True:
+            chunk = process.stdout.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            buffer += chunk
+            if len(buffer) > max_bytes:
+                raise AudioTooLarge(f"Audio exceeds {max_seconds} second limit")
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        feeder.join()
+        stderr = process.stderr.read()
+        process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to decode audio: {stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(buffer, dtype=np.float32, count=len(buffer) // 4)
+
+def duration_seconds(samples):
+    return len(samples) / SAMPLE_RATE
+
+def probe_duration(path):
+    # Container duration without decoding: parsed from the header when the format is known, else
+    # from ffprobe; None when unknown
+    try:
+        with open(path, "rb") as f:
+            duration = header_duration(f.read())
+    except OSError:
+        return None
+    if duration is not None:
+        return duration
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path]
+    try:
+        output = subprocess.run(cmd, capture_output=True, text=True, timeout=30).stdout.strip()
+        return float(output)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+# Upload sizes per second of audio assumed when the header gives no duration (~128 kbit/s)
+FALLBACK_BYTES_PER_SECOND = 16000
+
+def _wav_duration(data):
+    offset, byte_rate = 12, None
+    while offset + 8 <= len(data):
+        chunk_id, size = data[offset:offset + 4], struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        if chunk_id == b"fmt ":
+            byte_rate = struct.unpack("<I", data[offset + 16:offset + 20])[0]
+        elif chunk_id == b"data":
+            # Streaming writers leave the size unset; the rest of the file is audio then
+            size = min(size, len(data) - offset - 8)
+            return size / byte_rate if byte_rate else None
+        offset += 8 + size + (size & 1)
+    return None
+
+def _flac_duration(data):
+    # STREAMINFO: 20-bit sample rate, 3-bit channels, 5-bit depth, 36-bit total samples
+    packed = int.from_bytes(data[18:26], "big")
+    rate, total = packed >> 44, packed & ((1 << 36) - 1)
+    return total / rate if rate and total else None
+
+def _ogg_duration(data):
+    # Granule position of the last page, in samples at the codec's rate (Opus: always 48 kHz)
+    last = data.rfind(b"OggS")
+    granule = struct.unpack("<q", data[last + 6:last + 14])[0]
+    head = data[:512]
+    if b"OpusHead" in head:
+        start = head.index(b"OpusHead")
+        pre_skip = struct.unpack("<H", head[start + 10:start + 12])[0]
+        return max(0, granule - pre_skip) / 48000
+    if b"\x01vorbis" in head:
+        start = head.index(b"\x01vorbis")
+        rate = struct.unpack("<I", head[start + 12:start + 16])[0]
+        return granule / rate if rate else None
+    return None
+
+MP3_BITRATES = {1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+                2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+def _mp3_duration(data):
+    offset = 0
+    if data[:3] == b"ID3":
+        size = data[6:10]
+        offset = 10 + ((size[0] << 21) | (size[1] << 14) | (size[2] << 7) | size[3])
+    # An MPEG layer III frame header must follow directly; anything else (ADTS AAC shares the sync
+    # word) is left to the size-based estimate rather than searched for a look-alike
+    if offset + 4 > len(data) or not (data[offset] == 0xFF and data[offset + 1] & 0xE6 == 0xE2):
+        return None
+    header = struct.unpack(">I", data[offset:offset + 4])[0]
+    version = (header >> 19) & 3  # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+    if version == 1 or (header >> 12) & 15 in (0, 15) or (header >> 10) & 3 == 3:
+        return None
+    bitrate = MP3_BITRATES[1 if version == 3 else 2][(header >> 12) & 15] * 1000
+    rate = MP3_SAMPLE_RATES[version][(header >> 10) & 3]
+    samples_per_frame = 1152 if version == 3 else 576
+    mono = (header >> 6) & 3 == 3
+    # VBR files carry a frame count in a Xing/Info or VBRI tag; otherwise the bitrate is constant
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    xing = offset + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info") and struct.unpack(">I", data[xing + 4:xing + 8])[0] & 1:
+        return struct.unpack(">I", data[xing + 8:xing + 12])[0] * samples_per_frame / rate
+    vbri = offset + 36
+    if data[vbri:vbri + 4] == b"VBRI":
+        return struct.unpack(">I", data[vbri + 14:vbri + 18])[0] * samples_per_frame / rate
+    return (len(data) - offset) * 8 / bitrate
+
+def header_duration(data):
+    # Duration from the container header (WAV, FLAC, Ogg Opus/Vorbis, MP3) without decoding;
+    # None when the format is not recognised
+    try:
+        if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+            return _wav_duration(data)
+        if data[:4] == b"fLaC":
+            return _flac_duration(data)
+        if data[:4] == b"OggS":
+            return _ogg_duration(data)
+        if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+            return _mp3_duration(data)
+    except (struct.error, ValueError, IndexError, ZeroDivisionError):
+        return None
+    return None
+
+def expected_duration(data):
+    # Header duration, else a size-based guess; used to schedule work before anything is decoded
+    duration = header_duration(data)
+    return duration if duration is not None else len(data) / FALLBACK_BYTES_PER_SECOND
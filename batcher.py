@@ -0,0 +1,127 @@
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from metrics import Histogram
+from config import BATCH_MAX_WAIT_MS, COHERENCE_BATCH_MAX, WHISPER_BATCH_MAX
+
+class InferenceBatcher:
+    # Collects inputs from concurrent callers for up to max_wait_ms (or max_batch items) and runs
+    # them through batch_fn in one call. Each caller submits a list and gets a future of its outputs.
+    def __init__(self, name, batch_fn, max_batch, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.wait_seconds = Histogram([0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1])
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+
+    def submit(self, items):
+        future = Future()
+        if self.max_wait <= 0:
+            # Batching disabled: run inline
+            try:
+                future.set_result(list(self.batch_fn(items)))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._start()
+        self._queue.put((list(items), future, time.perf_counter()))
+        return future
+
+    def __call__(self, items):
+        return self.submit(items).result()
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(request)
+            size += len(request[0])
+        return pending
+
+    def _loop(self):
+        while True:
+            pending = self._collect()
+            started = time.perf_counter()
+            inputs = [item for items, _, _ in pending for item in items]
+            self.batch_sizes.observe(len(inputs))
+            for _, _, submitted in pending:
+                self.wait_seconds.observe(started - submitted)
+            try:
+                outputs = list(self.batch_fn(inputs))
+            except Exception as e:
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for items, future, _ in pending:
+                future.set_result(outputs[start:start + len(items)])
+                start += len(items)
+
+    def stats(self):
+        return {"batch_size": self.batch_sizes.snapshot(), "wait_seconds": self.wait_seconds.snapshot()}
+
+def _coherence_batch(texts):
+    from utils import coherence_scores
+    return coherence_scores(texts)
+
+coherence_batcher = InferenceBatcher("coherence", _coherence_batch, COHERENCE_BATCH_MAX)
+
+@functools.lru_cache(maxsize=None)
+def _batched_encoder_class():
+    # Built on first use: importing torch here would load it even when only ONNX Runtime runs
+    import torch
+
+    class BatchedEncoder(torch.nn.Module):
+        # Drop-in for Whisper's AudioEncoder: 30 s mel windows from all transcribing threads are
+        # encoded together, then each caller gets its own rows back
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+            self.batcher = InferenceBatcher("whisper-encoder", self._encode, WHISPER_BATCH_MAX)
+
+        def _encode(self, mels):
+            with torch.no_grad():
+                return list(self.encoder(torch.stack(mels)))
+
+        def forward(self, mel):
+            return torch.stack(self.batcher(list(mel)))
+
+    return BatchedEncoder
+
+_encoders = []
+_wrap_lock = threading.Lock()
+
+def batch_whisper_encoder(model):
+    # Idempotent: wraps model.encoder once
+    with _wrap_lock:
+        encoder_class = _batched_encoder_class()
+        if not isinstance(model.encoder, encoder_class):
+            model.encoder = encoder_class(model.encoder)
+            _encoders.append(model.encoder)
+    return model
+
+def batcher_stats():
+    stats = {"coherence": coherence_batcher.stats()}
+    for i, encoder in enumerate(_encoders):
+        stats[f"whisper-encoder-{i}"] = encoder.batcher.stats()
+    return stats
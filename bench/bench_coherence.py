@@ -0,0 +1,99 @@
+# Compare per-sentence pipeline calls against batched coherence inference on CPU, and the coherence
+# engines against each other: latency, load time and memory, and score parity with the PyTorch path.
+# Usage: python bench/bench_coherence.py --sentences 40 --repeat 3 --engines pytorch onnx-int8
+# Exits non-zero when an engine's scores drift from PyTorch by more than --max-drift.
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+import models
+from models import get_distilbert_model, get_coherence_model
+from utils import coherence_from_result, coherence_scores, PREDICTORS
+
+SAMPLE_SENTENCES = [
+    "I have been living in this city for about five years",
+    "My favourite hobby is reading books about history",
+    "um I think the main reason is that people like to travel",
+    "In my opinion technology has changed the way we communicate with our families",
+    "It is fun",
+    "When I was a child I used to play football with my friends every weekend after school",
+]
+
+MODEL_NAMES = {"pytorch": "distilbert", "onnx-int8": "distilbert-onnx-int8"}
+
+def per_sentence(sentences):
+    classifier = get_distilbert_model()
+    return [coherence_from_result(classifier(s, truncation=True, max_length=512)[0]) for s in sentences]
+
+def best_time(func, sentences, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(sentences)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def parity(reference, scores):
+    # Coherence drift and how often the feedback threshold (0.7) flips
+    reference, scores = np.asarray(reference), np.asarray(scores)
+    drift = np.abs(reference - scores)
+    return {
+        "max_drift": float(drift.max()),
+        "mean_drift": float(drift.mean()),
+        "threshold_agreement": float(np.mean((reference < 0.7) == (scores < 0.7)))
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument("--engines", nargs="+", default=["pytorch"], choices=sorted(PREDICTORS))
+    parser.add_argument("--max-drift", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    sentences = [SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)] for i in range(args.sentences)]
+
+    # Warm up model load and first-call allocations
+    per_sentence(sentences[:2])
+    coherence_scores(sentences[:2], engine="pytorch")
+
+    loop = best_time(per_sentence, sentences, args.repeat)
+    batched = best_time(lambda texts: coherence_scores(texts, engine="pytorch"), sentences, args.repeat)
+    reference = coherence_scores(sentences, engine="pytorch")
+    drift = max(abs(a - b) for a, b in zip(per_sentence(sentences), reference))
+
+    print(f"sentences: {len(sentences)}  torch threads: {torch.get_num_threads()}")
+    print(f"per-sentence: {loop:.3f}s  ({len(sentences) / loop:.1f} sentences/s)")
+    print(f"batched:      {batched:.3f}s  ({len(sentences) / batched:.1f} sentences/s)")
+    print(f"speedup: {loop / batched:.2f}x  max score drift: {drift:.2e}")
+
+    failed = False
+    for engine in args.engines:
+        if engine == "onnx-int8":
+            # Exported from the PyTorch model loaded above. The checkpoint ships without a trained
+            # classification head, so a cached export made by another process would not match it.
+            directory = models.onnx_coherence_dir() + "-bench"
+            models.export_coherence_onnx(directory)
+            models._load(MODEL_NAMES[engine], lambda: models.OnnxClassifier(directory))
+        get_coherence_model(engine)
+        coherence_scores(sentences[:2], engine=engine)
+        seconds = best_time(lambda texts: coherence_scores(texts, engine=engine), sentences, args.repeat)
+        entry = models._models[MODEL_NAMES[engine]]
+        check = parity(reference, coherence_scores(sentences, engine=engine))
+        print(f"{engine:>10}: {seconds:.3f}s ({len(sentences) / seconds:.1f} sentences/s, {batched / seconds:.2f}x), "
+              f"load {entry['load_seconds']:.1f}s, +{entry['rss_delta_bytes'] / 1e6:.0f} MB RSS, "
+              f"max drift {check['max_drift']:.3f}, mean drift {check['mean_drift']:.4f}, "
+              f"threshold agreement {check['threshold_agreement']:.0%}")
+        failed = failed or check["max_drift"] > args.max_drift
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
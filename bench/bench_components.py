@@ -0,0 +1,114 @@
+# Micro-benchmarks of the scoring, feedback, inference and transcription components on synthetic
+# transcripts/audio of several lengths. Whisper and LanguageTool are replaced by local stand-ins
+# by default, so the numbers are the service's own overhead; pass --stubs none for the real ones.
+# Usage: python bench/bench_components.py --lengths short medium long --json components.json
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Real models are only used when already in the local cache
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import stubs
+import synthetic
+from report import summarize, write_json
+
+def measure(func, setup=None, repeat=20, budget=2.0):
+    # At least 3 and at most `repeat` runs, stopping early once `budget` seconds are spent
+    func()  # warm-up
+    times, spent = [], 0.0
+    while len(times) < repeat and (len(times) < 3 or spent < budget):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+    return times
+
+def components(text, segments, samples, language, backends):
+    import evaluate
+    import grammar
+    from analysis import analyze
+    from feedback import generate_feedback
+    from models import get_grammar_tool
+    from transcribe import ENGINES, PROFILES
+    from utils import coherence_scores, TranscriptAnalysis
+    from vad import detect_pauses
+
+    # Scorers get the shared analysis, as in the service
+    shared = TranscriptAnalysis(text, segments, language)
+    sentences = shared.sentences
+    pauses = detect_pauses(samples, segments)
+    try:
+        tool = get_grammar_tool(language)
+    except Exception as e:
+        print(f"  LanguageTool unavailable ({type(e).__name__}: {e})")
+        tool = None
+    matches = grammar.check_sentences(tool, sentences, language) if tool is not None else None
+
+    def fresh_grammar_cache():
+        grammar.match_cache = grammar.MatchCache()
+
+    yield "transcript_analysis", lambda: TranscriptAnalysis(text, segments, language), None
+    yield "fluency_score", lambda: evaluate.fluency_score(segments, language, pauses, analysis=shared), None
+    yield "vocab_score", lambda: evaluate.vocab_score(text, analysis=shared), None
+    yield "pronunciation_score", lambda: evaluate.pronunciation_score(segments, language, analysis=shared), None
+    yield "generate_feedback", lambda: generate_feedback(
+        text, segments, language, sentence_matches=matches or [[] for _ in sentences],
+        sentence_coherence=[0.7] * len(sentences), pauses=pauses, analysis=shared), None
+    yield "detect_pauses", lambda: detect_pauses(samples, segments), None
+    if tool is not None:
+        yield "grammar_check", lambda: grammar.check_sentences(tool, sentences, language), fresh_grammar_cache
+    yield "distilbert", lambda: coherence_scores([text] + sentences), None
+    yield "analysis", lambda: analyze(text, segments, language, {}, pauses=pauses), fresh_grammar_cache
+    for spec in backends:
+        engine, size = PROFILES[spec] if spec in PROFILES else spec.split(":")
+        backend = ENGINES[engine](size)
+        yield f"transcribe:{spec}", lambda backend=backend: backend.transcribe(samples, language), None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", nargs="+", default=["short", "medium", "long"],
+                        help="named lengths (" + ", ".join(synthetic.LENGTHS) + ") or seconds")
+    parser.add_argument("--stubs", nargs="+", default=["whisper", "grammar"],
+                        choices=["whisper", "grammar", "coherence", "none"])
+    parser.add_argument("--backends", nargs="+", default=["stub:bench"],
+                        help="transcription engine:size pairs or profile names")
+    parser.add_argument("--only", nargs="+", help="run only these components")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds per component before stopping early")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    installed = stubs.install(whisper="whisper" in args.stubs, grammar="grammar" in args.stubs,
+                              coherence="coherence" in args.stubs, languages=[args.language])
+    results = []
+    unavailable = set()
+    for length in args.lengths:
+        length = length if length in synthetic.LENGTHS else float(length)
+        text, segments, samples = synthetic.sample(length)
+        print(f"{length}: {len(samples) / synthetic.SAMPLE_RATE:.0f}s audio, {len(text.split())} words")
+        for name, func, setup in components(text, segments, samples, args.language, args.backends):
+            if (args.only and name not in args.only) or name in unavailable:
+                continue
+            try:
+                times = measure(func, setup, args.repeat, args.budget)
+            except Exception as e:
+                # Real models may be unavailable offline
+                print(f"  {name:<28} skipped ({type(e).__name__}: {e})")
+                unavailable.add(name)
+                continue
+            latency = summarize(times)
+            results.append({"name": name, "length": str(length), "latency": latency})
+            print(f"  {name:<28} p50 {latency['p50_ms']:10.3f} ms  min {latency['min_ms']:10.3f} ms  n={latency['n']}")
+
+    if args.json:
+        write_json(args.json, "components", dict(vars(args), stubs=installed), results)
+
+if __name__ == "__main__":
+    main()
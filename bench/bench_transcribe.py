@@ -0,0 +1,81 @@
+# Real-time factor and word error rate of each transcription backend.
+# Samples are <name>.<wav|mp3|flac> files next to a <name>.txt reference transcript.
+# Usage: python bench/bench_transcribe.py --samples bench/samples --backends reference:base int8:base ctranslate2:base
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio import decode_audio, duration_seconds
+from transcribe import ENGINES, PROFILES
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".m4a")
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_errors(reference, hypothesis):
+    # Levenshtein distance over words
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1]
+
+def load_samples(directory):
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        base, ext = os.path.splitext(path)
+        if ext.lower() not in AUDIO_EXTENSIONS or not os.path.exists(base + ".txt"):
+            continue
+        with open(path, "rb") as f:
+            audio = decode_audio(f.read())
+        with open(base + ".txt", "r", encoding="utf-8") as f:
+            reference = f.read()
+        samples.append((os.path.basename(path), audio, reference))
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples"))
+    parser.add_argument("--backends", nargs="+", default=["reference:base", "int8:base", "ctranslate2:base"],
+                        help="engine:size pairs, or profile names (" + ", ".join(PROFILES) + ")")
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        sys.exit(f"No samples found in {args.samples} (expected <name>.wav + <name>.txt pairs)")
+    total_audio = sum(duration_seconds(audio) for _, audio, _ in samples)
+    print(f"{len(samples)} samples, {total_audio:.1f}s of audio")
+
+    for spec in args.backends:
+        engine, size = PROFILES[spec] if spec in PROFILES else spec.split(":")
+        try:
+            backend = ENGINES[engine](size)
+            load_start = time.perf_counter()
+            backend.load()
+            load_time = time.perf_counter() - load_start
+        except ImportError as e:
+            print(f"{spec:<24} skipped ({e})")
+            continue
+
+        errors = words = 0
+        elapsed = 0.0
+        for _, audio, reference in samples:
+            start = time.perf_counter()
+            text, _ = backend.transcribe(audio, args.language)
+            elapsed += time.perf_counter() - start
+            ref_words = normalize(reference)
+            errors += word_errors(ref_words, normalize(text))
+            words += len(ref_words)
+        print(f"{spec:<24} load {load_time:6.1f}s  RTF {elapsed / total_audio:.3f}  WER {errors / max(words, 1):.3f}")
+
+if __name__ == "__main__":
+    main()
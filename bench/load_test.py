@@ -0,0 +1,134 @@
+# End-to-end load generator: N closed-loop clients each upload a recording to /evaluate and wait
+# for the job, at several concurrency levels; reports p50/p95/p99 latency and throughput.
+# Runs the FastAPI app in-process (with optional stand-ins for Whisper, LanguageTool and
+# DistilBERT) or against a running server with --url. Every request sends distinct audio so the
+# result cache is not hit unless --same-audio is given. Decoding needs ffmpeg on the PATH.
+# Usage: python bench/load_test.py --concurrency 1 2 4 8 --requests 40 --stubs whisper grammar --json load.json
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import stubs
+import synthetic
+from report import summarize, write_json
+
+def make_client(url):
+    if url:
+        import httpx
+        return httpx.Client(base_url=url, timeout=120)
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+def evaluate_once(client, audio, language, max_wait):
+    # Returns (status, latency_seconds, rejected_count, job)
+    start = time.perf_counter()
+    rejected = 0
+    while True:
+        response = client.post("/evaluate", files={"file": ("bench.wav", audio, "audio/wav")},
+                               data={"language": language})
+        if response.status_code != 429:
+            break
+        rejected += 1
+        time.sleep(0.05)
+    body = response.json()
+    if "job_id" not in body:
+        return "error", time.perf_counter() - start, rejected, body
+    deadline = start + max_wait
+    while True:
+        job = client.get(f"/jobs/{body['job_id']}", params={"wait": 10, "timings": "true"}).json()
+        if job.get("status") in ("done", "failed") or time.perf_counter() > deadline:
+            return job.get("status", "error"), time.perf_counter() - start, rejected, job
+
+def run_level(url, concurrency, requests, length, language, same_audio, max_wait):
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    latencies, statuses, stages = [], defaultdict(int), defaultdict(list)
+    rejected = [0]
+    shared = synthetic.wav_bytes(synthetic.sample(length)[2]) if same_audio else None
+
+    def worker():
+        client = make_client(url)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            audio = shared or synthetic.wav_bytes(synthetic.sample(length, seed=i + concurrency * 100000)[2])
+            status, latency, retries, job = evaluate_once(client, audio, language, max_wait)
+            with lock:
+                statuses[status] += 1
+                rejected[0] += retries
+                if status == "done":
+                    latencies.append(latency)
+                    for stage, value in (job.get("timings") or {}).items():
+                        if stage != "audio_seconds" and isinstance(value, (int, float)):
+                            stages[stage].append(value)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    seconds = synthetic.LENGTHS.get(length, length)
+    return {
+        "concurrency": concurrency,
+        "length": str(length),
+        "requests": requests,
+        "statuses": dict(statuses),
+        "rejected_429": rejected[0],
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3),
+        "audio_seconds_per_second": round(len(latencies) * float(seconds) / wall, 3),
+        "latency": summarize(latencies),
+        "stage_mean_ms": {stage: round(1000 * sum(v) / len(v), 3) for stage, v in sorted(stages.items())}
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=20, help="requests per concurrency level")
+    parser.add_argument("--length", default="short", help="named length or seconds of audio per request")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--stubs", nargs="+", default=[], choices=["whisper", "grammar", "coherence"],
+                        help="in-process only: local stand-ins for the heavy dependencies")
+    parser.add_argument("--whisper-rtf", type=float, default=0.0, help="simulated real-time factor of stub Whisper")
+    parser.add_argument("--grammar-latency", type=float, default=0.0, help="simulated LanguageTool round trip (s)")
+    parser.add_argument("--same-audio", action="store_true", help="send identical audio (measures cache hits)")
+    parser.add_argument("--max-wait", type=float, default=300, help="give up on a job after this many seconds")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    length = args.length if args.length in synthetic.LENGTHS else float(args.length)
+    installed = []
+    if not args.url:
+        # Keep benchmark results out of the real history and recordings
+        os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="bench-"))
+        installed = stubs.install(whisper="whisper" in args.stubs, grammar="grammar" in args.stubs,
+                                  coherence="coherence" in args.stubs, languages=[args.language],
+                                  whisper_rtf=args.whisper_rtf, grammar_latency=args.grammar_latency)
+
+    results = []
+    for concurrency in args.concurrency:
+        result = run_level(args.url, concurrency, args.requests, length, args.language, args.same_audio, args.max_wait)
+        results.append(result)
+        latency = result["latency"]
+        print(f"concurrency {concurrency:3d}: {result['throughput_rps']:7.2f} req/s  "
+              f"p50 {latency.get('p50_ms', 0):9.1f} ms  p95 {latency.get('p95_ms', 0):9.1f} ms  "
+              f"p99 {latency.get('p99_ms', 0):9.1f} ms  {result['statuses']}  429s: {result['rejected_429']}")
+
+    if args.json:
+        write_json(args.json, "load", dict(vars(args), stubs=installed), results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Summary statistics and JSON output shared by the benchmarks, plus a comparison of two runs.
+# Usage: python bench/report.py before.json after.json
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def summarize(seconds):
+    # Latency summary in milliseconds
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(values):
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "n": int(len(values)),
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import torch
+        threads = torch.get_num_threads()
+    except ImportError:
+        threads = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "torch_threads": threads,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+def write_json(path, benchmark, options, results):
+    report = {"benchmark": benchmark, "environment": environment(), "options": options, "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def _key(result):
+    return tuple(str(result.get(k)) for k in ("name", "length", "concurrency") if k in result)
+
+def compare(before, after, metric):
+    # Rows matched by name/length/concurrency; ratio < 1 means the second run is faster
+    old = {_key(r): r for r in before["results"]}
+    for result in after["results"]:
+        previous = old.get(_key(result))
+        if previous is None or metric not in previous.get("latency", {}) or metric not in result.get("latency", {}):
+            continue
+        a, b = previous["latency"][metric], result["latency"][metric]
+        ratio = b / a if a else float("inf")
+        print(f"{' / '.join(_key(result)):<40} {a:10.3f} -> {b:10.3f} ms  x{ratio:.2f}")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="p50_ms")
+    args = parser.parse_args()
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    if before["benchmark"] != after["benchmark"]:
+        sys.exit(f"Different benchmarks: {before['benchmark']} vs {after['benchmark']}")
+    print(f"{before['environment']['commit']} -> {after['environment']['commit']} ({args.metric})")
+    compare(before, after, args.metric)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Local stand-ins for the heavy dependencies, so the benchmarks run offline and can measure the
+# service's own Python overhead without Whisper, the LanguageTool server or DistilBERT.
+# Each stand-in can simulate its dependency's latency with a fixed or audio-proportional sleep.
+import re
+import time
+from synthetic import synthetic_segments, transcript, SAMPLE_RATE
+
+class StubMatch:
+    # The attributes of language_tool_python's Match that the service reads
+    def __init__(self, offset, length, message, replacements, rule_id):
+        self.offset = offset
+        self.errorLength = length
+        self.message = message
+        self.replacements = replacements
+        self.ruleId = rule_id
+
+# (pattern, message, rule id, replacement for the matched text); group "error" narrows the span
+RULES = [
+    (re.compile(r"\b(\w+) \1\b", re.IGNORECASE), "Possible typo: you repeated a word",
+     "ENGLISH_WORD_REPEAT_RULE", lambda m: m.group(1)),
+    (re.compile(r"\bhe go\b", re.IGNORECASE), "The verb does not agree with the subject", "HE_VERB_AGR",
+     lambda m: "he goes"),
+    (re.compile(r"\bi has\b"), "The verb does not agree with the subject", "I_HAS", lambda m: "I have"),
+    (re.compile(r"(?:^|\. )(?P<error>i)\b"), "Use a capital 'I'", "I_LOWERCASE", lambda m: "I"),
+]
+
+class StubGrammarTool:
+    # Regex rules instead of a LanguageTool server; latency is a per-request round trip plus
+    # a per-character cost
+    def __init__(self, latency=0.0, per_char=0.0):
+        self.latency = latency
+        self.per_char = per_char
+
+    def check(self, text):
+        if self.latency or self.per_char:
+            time.sleep(self.latency + self.per_char * len(text))
+        matches = []
+        for pattern, message, rule_id, replacement in RULES:
+            for m in pattern.finditer(text):
+                start, end = m.span("error") if "error" in pattern.groupindex else m.span()
+                matches.append(StubMatch(start, end - start, message, [replacement(m)], rule_id))
+        return sorted(matches, key=lambda m: m.offset)
+
+    def close(self):
+        pass
+
+class StubBackend:
+    # Transcription backend that returns a synthetic transcript for the audio's length. rtf > 0
+    # sleeps rtf * audio duration, like a model running at that real-time factor.
+    engine = "stub"
+    rtf = 0.0
+
+    def __init__(self, size="bench"):
+        self.size = size
+        self.tag = f"{self.engine}:{size}"
+
+    def load(self):
+        return self
+
+    def transcribe(self, audio, language):
+        seconds = len(audio) / SAMPLE_RATE
+        if self.rtf:
+            time.sleep(self.rtf * seconds)
+        segments = synthetic_segments(seconds, seed=len(audio))
+        return transcript(segments), segments
+
+def stub_coherence(latency=0.0):
+    def score(texts):
+        if latency:
+            time.sleep(latency)
+        return [0.5 + (len(text) % 7) / 20 for text in texts]
+    return score
+
+def install(whisper=False, grammar=False, coherence=False, languages=("en",),
+            whisper_rtf=0.0, grammar_latency=0.0, coherence_latency=0.0):
+    # Swap stand-ins into the service's registries; must run before the first request
+    import batcher
+    import models
+    import transcribe
+    from config import LANGUAGE_TOOL_CODES
+    installed = []
+    # Always selectable by name (e.g. "stub:bench"), the default backend only when requested
+    transcribe.ENGINES["stub"] = StubBackend
+    StubBackend.rtf = whisper_rtf
+    if whisper:
+        transcribe.TRANSCRIBE_BACKEND = "stub"
+        transcribe.TRANSCRIBE_PROFILE = ""
+        installed.append("whisper")
+    if grammar:
+        for language in languages:
+            code = LANGUAGE_TOOL_CODES.get(language)
+            if code is not None:
+                models._load(f"languagetool:{code}", lambda: StubGrammarTool(grammar_latency))
+        installed.append("grammar")
+    if coherence:
+        batcher.coherence_batcher.batch_fn = stub_coherence(coherence_latency)
+        installed.append("coherence")
+    return installed
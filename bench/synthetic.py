@@ -0,0 +1,83 @@
+# Deterministic synthetic speech for the benchmarks: transcripts in Whisper's segment layout and
+# matching audio (tone bursts for words, low noise for pauses). Generated on demand from a seed
+# instead of shipping recordings, so the suite runs offline and every run sees the same input.
+import io
+import random
+import wave
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Named lengths in seconds
+LENGTHS = {"short": 15, "medium": 60, "long": 300}
+
+VOCABULARY = (
+    "I think the main reason is that people want to spend more time with their families and "
+    "friends because work has become very stressful in my country so many of us try to travel "
+    "during holidays or read books and watch films at home when the weather is bad"
+).split()
+FILLERS = ["um", "uh", "like", "you know"]
+# Picked up by the stub grammar checker
+MISTAKES = ["he go", "the the", "i has"]
+
+def synthetic_segments(seconds, seed=0, words_per_second=2.2):
+    # Sentences of 6-14 words; about one filler per 15 words, one mistake per 4 sentences and a
+    # long pause (1-2.5 s) every few sentences
+    rng = random.Random(seed)
+    segments, t = [], 0.3
+    while t < seconds - 1.0:
+        tokens = [rng.choice(VOCABULARY) for _ in range(rng.randint(6, 14))]
+        if rng.random() < 0.6:
+            tokens.insert(rng.randrange(len(tokens)), rng.choice(FILLERS))
+        if rng.random() < 0.25:
+            at = rng.randrange(len(tokens))
+            tokens[at:at] = rng.choice(MISTAKES).split()
+        words = []
+        for token in " ".join(tokens).split():
+            length = rng.uniform(0.6, 1.4) / words_per_second
+            if t + length > seconds - 0.2:
+                break
+            words.append({"word": " " + token, "start": round(t, 2), "end": round(t + length, 2),
+                          "probability": round(rng.uniform(0.7, 1.0), 3)})
+            t += length + rng.uniform(0.02, 0.12)
+        if not words:
+            break
+        words[-1]["word"] += "."
+        segments.append({
+            "id": len(segments),
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": "".join(w["word"] for w in words),
+            "words": words
+        })
+        t += rng.uniform(1.0, 2.5) if rng.random() < 0.3 else rng.uniform(0.2, 0.5)
+    return segments
+
+def transcript(segments):
+    return "".join(s["text"] for s in segments)
+
+def synthetic_audio(segments, seconds, seed=0, sample_rate=SAMPLE_RATE):
+    rng = np.random.default_rng(seed)
+    samples = (rng.standard_normal(int(seconds * sample_rate)) * 0.002).astype(np.float32)
+    for segment in segments:
+        for word in segment["words"]:
+            start, end = int(word["start"] * sample_rate), int(word["end"] * sample_rate)
+            t = np.arange(end - start) / sample_rate
+            pitch = rng.uniform(120, 260)
+            samples[start:end] += (0.3 * np.sin(2 * np.pi * pitch * t)).astype(np.float32)
+    return samples
+
+def wav_bytes(samples, sample_rate=SAMPLE_RATE):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+def sample(length, seed=0):
+    # (transcript, segments, samples) for a named length or a number of seconds
+    seconds = LENGTHS.get(length, length)
+    segments = synthetic_segments(float(seconds), seed)
+    return transcript(segments), segments, synthetic_audio(segments, float(seconds), seed)
@@ -0,0 +1,65 @@
+# Per-process memory of a gunicorn deployment: the master, its workers and any LanguageTool JVM they
+# started. PSS splits shared pages between the processes mapping them, so its total is what the
+# deployment really uses; compare it with PRELOAD_MODELS=0 to see the copy-on-write saving.
+# Usage: python bench/worker_memory.py $(cat gunicorn.pid) [--json]
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import process_memory
+
+def children(pid):
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid follows the closing parenthesis
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+def command(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="ignore").strip()[:80]
+    except OSError:
+        return ""
+
+def report(master):
+    rows = [{"pid": master, "role": "master", "command": command(master), **process_memory(master)}]
+    for pid in children(master):
+        cmd = command(pid)
+        role = "languagetool" if "languagetool" in cmd.lower() else "worker"
+        rows.append({"pid": pid, "role": role, "command": cmd, **process_memory(pid)})
+        # JVMs started lazily by a worker (no preload) are grandchildren of the master
+        for grandchild in children(pid):
+            rows.append({"pid": grandchild, "role": "languagetool", "command": command(grandchild),
+                         **process_memory(grandchild)})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of a gunicorn master and its workers")
+    parser.add_argument("pid", type=int, help="gunicorn master pid")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    rows = report(args.pid)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'pid':>8} {'role':<13} {'rss MB':>9} {'pss MB':>9} {'private MB':>11}")
+    for row in rows:
+        print(f"{row['pid']:>8} {row['role']:<13} {row['rss_bytes'] / 1e6:>9.0f} "
+              f"{row.get('pss_bytes', 0) / 1e6:>9.0f} {row.get('private_bytes', 0) / 1e6:>11.0f}")
+    print(f"{'total':>8} {'':<13} {sum(r['rss_bytes'] for r in rows) / 1e6:>9.0f} "
+          f"{sum(r.get('pss_bytes', 0) for r in rows) / 1e6:>9.0f} "
+          f"{sum(r.get('private_bytes', 0) for r in rows) / 1e6:>11.0f}")
+
+if __name__ == "__main__":
+    main()
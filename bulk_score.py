@@ -0,0 +1,233 @@
+# Re-score a corpus of recordings offline, e.g. everything in RECORDINGS_DIR after a model or rubric
+# change. Files are scored longest first by a pool of worker processes (each loads the models once and
+# they share one LanguageTool server) and results stream to JSONL or Parquet with the same fields as
+# the /evaluate result. Completed files are listed in a checkpoint, so an interrupted run picks up
+# where it stopped.
+# Usage: python bulk_score.py data/recordings --out rescored.jsonl --workers 4
+#        python bulk_score.py manifest.jsonl --out rescored.parquet --language en
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import RECORDINGS_DIR, MAX_AUDIO_SECONDS
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".opus", ".m4a", ".webm")
+
+def find_files(source, language):
+    # A directory (searched recursively), a JSONL manifest of {"path", "language"} objects or a
+    # text manifest with one path per line; returns (path, language) pairs
+    if os.path.isdir(source):
+        items = []
+        for root, _, names in os.walk(source):
+            for name in sorted(names):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    items.append((os.path.join(root, name), language))
+        return sorted(items)
+    base = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if source.endswith(".jsonl"):
+                entry = json.loads(line)
+                path, item_language = entry["path"], entry.get("language", language)
+            else:
+                path, item_language = line, language
+            items.append((os.path.join(base, path), item_language))
+    return items
+
+def order_by_duration(items, threads=8):
+    # Longest first, so the pool is not left waiting on one long file at the end. Falls back to the
+    # same size-based estimate the server schedules with when the container has no duration.
+    from audio import probe_duration, FALLBACK_BYTES_PER_SECOND
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        durations = list(executor.map(lambda item: probe_duration(item[0]), items))
+    keyed = []
+    for (path, language), duration in zip(items, durations):
+        if duration is None:
+            duration = os.path.getsize(path) / FALLBACK_BYTES_PER_SECOND
+        keyed.append((duration, path, language))
+    keyed.sort(reverse=True)
+    return [(path, language, duration) for duration, path, language in keyed]
+
+# Worker process state
+_profile = None
+_max_seconds = MAX_AUDIO_SECONDS
+_init_error = None
+
+def _init_worker(profile, threads, max_seconds):
+    global _profile, _max_seconds, _init_error
+    _profile, _max_seconds = profile, max_seconds
+    try:
+        from models import after_fork, get_coherence_model
+        after_fork(threads)
+        from transcribe import get_backend
+        get_backend(profile).load()
+        get_coherence_model()
+    except Exception as e:
+        # Raising here would make the pool respawn the worker forever; fail its files instead
+        _init_error = f"Model loading failed: {type(e).__name__}: {e}"
+
+def _score_file(item):
+    path, language, _ = item
+    if _init_error is not None:
+        return path, None, _init_error, 0.0
+    from audio import decode_audio, duration_seconds
+    from pipeline import evaluate_samples, timed
+    try:
+        timings = {}
+        with open(path, "rb") as f:
+            data = f.read()
+        with timed(timings, "decode"):
+            samples = decode_audio(data, _max_seconds)
+        result = evaluate_samples(samples, language, _profile, timings)
+        result["audio_path"] = path
+        return path, result, None, duration_seconds(samples)
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}", 0.0
+
+# Parquet columns, in /evaluate result order
+def parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("timestamp", pa.string()),
+        ("language", pa.string()),
+        ("band_score", pa.float64()),
+        ("fluency", pa.float64()),
+        ("grammar", pa.float64()),
+        ("vocabulary", pa.float64()),
+        ("pronunciation", pa.float64()),
+        ("transcript", pa.string()),
+        ("feedback", pa.list_(pa.struct([("area", pa.string()), ("rule", pa.string()), ("time", pa.string()),
+                                         ("issue", pa.string()), ("suggestion", pa.string()),
+                                         ("start", pa.float64()), ("end", pa.float64()),
+                                         ("sentence", pa.int64())]))),
+        ("pauses", pa.list_(pa.struct([("start", pa.float64()), ("end", pa.float64()),
+                                       ("duration", pa.float64())]))),
+        ("audio_path", pa.string())
+    ])
+
+# Writers return the paths whose results are safely on disk, for the checkpoint
+
+class JSONLWriter:
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, path, result):
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+        return [path]
+
+    def close(self):
+        self._file.close()
+        return []
+
+class ParquetWriter:
+    # A Parquet dataset directory: every `rows_per_file` results become one complete part file, so
+    # an interrupted run never leaves a file without its footer. A resumed run adds new parts; read
+    # the directory with pandas.read_parquet or pyarrow.dataset.
+    def __init__(self, directory, rows_per_file=256):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.schema = parquet_schema()
+        self.rows_per_file = rows_per_file
+        self._part = len([name for name in os.listdir(directory) if name.endswith(".parquet")])
+        self._rows = []
+        self._paths = []
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not self._rows:
+            return []
+        target = os.path.join(self.directory, f"part-{self._part:05d}.parquet")
+        pq.write_table(pa.Table.from_pylist(self._rows, schema=self.schema), target + ".tmp")
+        os.replace(target + ".tmp", target)
+        self._part += 1
+        flushed, self._rows, self._paths = self._paths, [], []
+        return flushed
+
+    def write(self, path, result):
+        self._rows.append({name: result.get(name) for name in self.schema.names})
+        self._paths.append(path)
+        return self._flush() if len(self._rows) >= self.rows_per_file else []
+
+    def close(self):
+        return self._flush()
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a directory or manifest of recordings")
+    parser.add_argument("source", nargs="?", default=RECORDINGS_DIR, help="directory, .jsonl or .txt manifest")
+    parser.add_argument("--out", required=True, help="results file (.jsonl) or Parquet dataset directory (.parquet)")
+    parser.add_argument("--language", default="en", help="language for files without one in the manifest")
+    parser.add_argument("--profile", default=None, help="transcription profile")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--checkpoint", help="completed-files list (default: <out>.done)")
+    parser.add_argument("--max-seconds", type=float, default=MAX_AUDIO_SECONDS)
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or args.out + ".done"
+    done = load_checkpoint(checkpoint)
+    items = [item for item in find_files(args.source, args.language) if item[0] not in done]
+    if not items:
+        print(f"Nothing to do ({len(done)} files already scored)", file=sys.stderr)
+        return
+    items = order_by_duration(items)
+    print(f"{len(items)} files to score, {len(done)} already done, {args.workers} workers", file=sys.stderr)
+
+    # LanguageTool is started here, before the fork, so the workers share its server(s) over HTTP
+    # instead of each starting a JVM; this process stops it when the run ends
+    from models import get_grammar_tool
+    for language in sorted({language for _, language, _ in items}):
+        try:
+            get_grammar_tool(language)
+        except Exception as e:
+            sys.exit(f"LanguageTool failed to start: {type(e).__name__}: {e}")
+
+    writer = ParquetWriter(args.out) if args.out.endswith(".parquet") else JSONLWriter(args.out)
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    started = time.perf_counter()
+    scored = failed = 0
+    audio_total = 0.0
+    with multiprocessing.get_context("fork").Pool(
+        args.workers, initializer=_init_worker,
+        initargs=(args.profile, threads, args.max_seconds)
+    ) as pool, open(checkpoint, "a", encoding="utf-8") as done_file, \
+            open(args.out + ".errors.jsonl", "a", encoding="utf-8") as error_file:
+        try:
+            # chunksize=1: each worker takes the next-longest file as soon as it is free
+            for path, result, error, seconds in pool.imap_unordered(_score_file, items, chunksize=1):
+                if error is not None:
+                    failed += 1
+                    error_file.write(json.dumps({"path": path, "error": error}) + "\n")
+                    error_file.flush()
+                    print(f"failed: {path}: {error}", file=sys.stderr)
+                    continue
+                # Results first, then the checkpoint: a crash in between re-scores those files on resume
+                for written in writer.write(path, result):
+                    done_file.write(written + "\n")
+                done_file.flush()
+                scored += 1
+                audio_total += seconds
+                if scored % 25 == 0:
+                    wall = time.perf_counter() - started
+                    print(f"{scored}/{len(items)} scored, {audio_total / wall:.1f} audio s/s", file=sys.stderr)
+        finally:
+            for written in writer.close():
+                done_file.write(written + "\n")
+    wall = time.perf_counter() - started
+    print(f"Scored {scored} files ({audio_total:.0f}s of audio) in {wall:.0f}s, {failed} failed", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
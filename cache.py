@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from config import RESULT_CACHE_SIZE, RESULT_CACHE_DIR, RESULT_CACHE_DISK_ENTRIES
+
+# Fields of a result that depend only on the audio, language and models
+CACHED_FIELDS = ["band_score", "fluency", "grammar", "vocabulary", "pronunciation", "transcript", "feedback", "pauses"]
+
+def audio_key(samples, language, version):
+    digest = hashlib.sha256(samples.tobytes())
+    digest.update(f"\0{language}\0{version}".encode("utf-8"))
+    return digest.hexdigest()
+
+class ResultCache:
+    # In-memory LRU with an optional on-disk tier of JSON files. The disk tier is bounded too: file
+    # mtimes record last use, and past disk_entries files the oldest are swept down to 90% of it.
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, directory=RESULT_CACHE_DIR, disk_entries=RESULT_CACHE_DISK_ENTRIES):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.disk_entries = disk_entries
+        self.disk_evictions = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._disk_count = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_count = len(self._disk_files())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _disk_files(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            files.extend(os.path.join(root, name) for name in names if name.endswith(".json"))
+        return files
+
+    def _sweep(self):
+        # Other processes may share the directory, so count what is really there
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            for path in self._disk_files():
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    pass
+            entries.sort()
+            excess = max(0, len(entries) - int(self.disk_entries * 0.9))
+            for _, path in entries[:excess]:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self._disk_count = len(entries) - excess
+                self.disk_evictions += excess
+        finally:
+            self._sweep_lock.release()
+
+    def _remember(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.memory_hits += 1
+                return dict(self._data[key])
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, "r") as f:
+                    value = json.load(f)
+                os.utime(path)  # Marks it recently used for the sweep
+            except (FileNotFoundError, ValueError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                return dict(value)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result):
+        value = {field: result[field] for field in CACHED_FIELDS}
+        with self._lock:
+            self._remember(key, value)
+        if self.directory:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+            with self._lock:
+                self._disk_count += 1
+                full = self.disk_entries and self._disk_count > self.disk_entries
+            if full:
+                self._sweep()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "disk": bool(self.directory),
+                "disk_entries": self._disk_count,
+                "disk_max_entries": self.disk_entries,
+                "disk_evictions": self.disk_evictions
+            }
+
+result_cache = ResultCache()
@@ -0,0 +1,142 @@
+import os
+
+# Storage locations
+DATA_DIR = os.environ.get("DATA_DIR", "../data")
+RECORDINGS_DIR = os.path.join(DATA_DIR, "recordings")
+HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
+
+# Results store: "sqlite" (default) or "jsonl" append log
+RESULTS_STORE = os.environ.get("RESULTS_STORE", "sqlite")
+RESULTS_DB = os.path.join(DATA_DIR, "history.db")
+RESULTS_JSONL = os.path.join(DATA_DIR, "history.jsonl")
+
+# Languages accepted by /evaluate and the ones whose models are loaded at startup
+# (full set: en, zh, hi, es, fr, ar, bn, ru, pt, ur)
+SUPPORTED_LANGUAGES = os.environ.get("SUPPORTED_LANGUAGES", "en").split(",")
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "0") == "1"
+WARMUP_LANGUAGES = os.environ.get("WARMUP_LANGUAGES", ",".join(SUPPORTED_LANGUAGES)).split(",")
+
+# Models
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base")
+# Transcription engine: "reference" (openai-whisper), "int8" (dynamic-quantized PyTorch) or
+# "ctranslate2" (faster-whisper int8). A profile ("fast", "balanced", "accurate") overrides both.
+TRANSCRIBE_BACKEND = os.environ.get("TRANSCRIBE_BACKEND", "reference")
+TRANSCRIBE_PROFILE = os.environ.get("TRANSCRIBE_PROFILE", "")
+DISTILBERT_MODEL = "distilbert-base-multilingual-cased"
+# Coherence classifier engine: "pytorch" (transformers) or "onnx-int8" (exported once to ONNX with
+# int8 weights, cached in ONNX_CACHE_DIR, run by ONNX Runtime on COHERENCE_THREADS threads, 0 = auto)
+COHERENCE_ENGINE = os.environ.get("COHERENCE_ENGINE", "pytorch")
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR", os.path.join(DATA_DIR, "onnx"))
+COHERENCE_THREADS = int(os.environ.get("COHERENCE_THREADS", "0"))
+LANGUAGE_TOOL_CODES = {
+    "en": "en-US",
+    "es": "es",
+    "fr": "fr",
+    "ru": "ru",
+    "pt": "pt-PT"
+}
+
+# LanguageTool: by default one local server (a single JVM) is started for all languages and checked
+# over pooled HTTP connections; LANGUAGETOOL_URL points at existing servers instead (comma-separated,
+# used round-robin). LANGUAGETOOL_SHARED=0 restores one in-process server per language.
+LANGUAGETOOL_URL = os.environ.get("LANGUAGETOOL_URL", "")
+LANGUAGETOOL_SHARED = os.environ.get("LANGUAGETOOL_SHARED", "1") == "1"
+LANGUAGETOOL_POOL_SIZE = int(os.environ.get("LANGUAGETOOL_POOL_SIZE", "8"))
+LANGUAGETOOL_TIMEOUT = float(os.environ.get("LANGUAGETOOL_TIMEOUT", "30"))
+
+# Multi-worker serving (gunicorn.conf.py): models are loaded once in the master and shared
+# copy-on-write by WEB_WORKERS forked workers, each using TORCH_THREADS threads (0 = cores / workers)
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "2"))
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", "0"))
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "1") == "1"
+
+# Upload limits and archiving of the original recording
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+MAX_AUDIO_SECONDS = float(os.environ.get("MAX_AUDIO_SECONDS", "900"))
+ARCHIVE_UPLOADS = os.environ.get("ARCHIVE_UPLOADS", "1") == "1"
+
+# Recording archive: content-addressed files in RECORDINGS_DIR, encoded in the background as
+# "flac" (lossless 16 kHz mono), "opus" (RECORDING_OPUS_BITRATE) or "original" (upload bytes as-is).
+# The compaction job re-encodes recordings older than RECORDING_FULL_DAYS to low-bitrate Opus and
+# deletes them after RECORDING_DELETE_DAYS (0 disables either step).
+RECORDING_FORMAT = os.environ.get("RECORDING_FORMAT", "flac")
+RECORDING_OPUS_BITRATE = os.environ.get("RECORDING_OPUS_BITRATE", "32k")
+RECORDING_COMPACT_BITRATE = os.environ.get("RECORDING_COMPACT_BITRATE", "12k")
+RECORDING_FULL_DAYS = float(os.environ.get("RECORDING_FULL_DAYS", "30"))
+RECORDING_DELETE_DAYS = float(os.environ.get("RECORDING_DELETE_DAYS", "0"))
+
+# Pause detection: gaps between words of at least PAUSE_MIN_SECONDS that the energy VAD
+# confirms as silence. Leading/trailing silence is trimmed before transcription.
+PAUSE_MIN_SECONDS = float(os.environ.get("PAUSE_MIN_SECONDS", "0.3"))
+VAD_MARGIN_DB = float(os.environ.get("VAD_MARGIN_DB", "12"))
+VAD_FLOOR_DB = float(os.environ.get("VAD_FLOOR_DB", "-60"))
+TRIM_SILENCE = os.environ.get("TRIM_SILENCE", "1") == "1"
+
+# Evaluation result cache, keyed by decoded audio + language + model versions.
+# Bump SCORING_VERSION when the scoring or feedback rules change.
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "")  # empty = memory only
+# Most results kept on disk; the least recently used are removed past it (0 = unbounded)
+RESULT_CACHE_DISK_ENTRIES = int(os.environ.get("RESULT_CACHE_DISK_ENTRIES", "10000"))
+SCORING_VERSION = "5"
+
+# Cross-request inference batching: callers wait up to BATCH_MAX_WAIT_MS (0 disables) for others
+# to join a batch. Whisper encoder batching applies to the PyTorch engines and is opt-in.
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+COHERENCE_BATCH_MAX = int(os.environ.get("COHERENCE_BATCH_MAX", "128"))
+WHISPER_BATCHING = os.environ.get("WHISPER_BATCHING", "0") == "1"
+WHISPER_BATCH_MAX = int(os.environ.get("WHISPER_BATCH_MAX", "8"))
+
+# WebSocket streaming: transcribe every STREAM_STEP_SECONDS of new audio over a window of at
+# most STREAM_WINDOW_SECONDS; segments ending STREAM_HOLDBACK_SECONDS before the live edge are final
+STREAM_STEP_SECONDS = float(os.environ.get("STREAM_STEP_SECONDS", "2.0"))
+STREAM_HOLDBACK_SECONDS = float(os.environ.get("STREAM_HOLDBACK_SECONDS", "1.0"))
+STREAM_WINDOW_SECONDS = float(os.environ.get("STREAM_WINDOW_SECONDS", "30.0"))
+MAX_STREAMS = int(os.environ.get("MAX_STREAMS", "8"))
+
+# Long recordings (>= LONGFORM_MIN_SECONDS) are split at silences into overlapping chunks and
+# transcribed in parallel by LONGFORM_WORKERS worker processes (0 or 1 disables). Workers are spawned
+# per transcription profile used and each holds its own copy of that model, so budget
+# LONGFORM_WORKERS x the model's memory per profile (fp32 Whisper: ~0.3 GB base, ~1 GB small, ~3 GB medium).
+LONGFORM_WORKERS = int(os.environ.get("LONGFORM_WORKERS", "0"))
+LONGFORM_MIN_SECONDS = float(os.environ.get("LONGFORM_MIN_SECONDS", "180"))
+LONGFORM_CHUNK_SECONDS = float(os.environ.get("LONGFORM_CHUNK_SECONDS", "60"))
+LONGFORM_OVERLAP_SECONDS = float(os.environ.get("LONGFORM_OVERLAP_SECONDS", "2"))
+
+# Evaluation job queue
+EVAL_EXECUTOR = os.environ.get("EVAL_EXECUTOR", "thread")  # "thread" or "process"
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", "2"))
+MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", "16"))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", "3600"))
+# Scheduling: waiting jobs start shortest-first by expected audio length (read from the container
+# header), gaining SCHEDULER_AGING seconds of priority per second waited so long jobs still run.
+# FAST_LANE_WORKERS workers only take clips of at most FAST_LANE_SECONDS.
+SCHEDULER_AGING = float(os.environ.get("SCHEDULER_AGING", "4"))
+FAST_LANE_SECONDS = float(os.environ.get("FAST_LANE_SECONDS", "30"))
+FAST_LANE_WORKERS = int(os.environ.get("FAST_LANE_WORKERS", str(min(1, EVAL_WORKERS - 1))))
+
+# Deadlines: each evaluation must finish within the X-Deadline-Seconds request header or
+# DEADLINE_SECONDS (0 = no deadline). When recent stage costs say it will not (using DEADLINE_MARGIN
+# of the time left), or DEGRADE_QUEUE_DEPTH jobs are waiting, optional work is dropped: transcription
+# falls back to DEGRADE_PROFILE, per-sentence coherence feedback is skipped and LanguageTool checks
+# only the first sentences that fit (at least GRAMMAR_MIN_SENTENCES).
+DEADLINE_SECONDS = float(os.environ.get("DEADLINE_SECONDS", "0"))
+DEADLINE_MARGIN = float(os.environ.get("DEADLINE_MARGIN", "0.8"))
+DEGRADE_PROFILE = os.environ.get("DEGRADE_PROFILE", "fast")
+DEGRADE_QUEUE_DEPTH = int(os.environ.get("DEGRADE_QUEUE_DEPTH", str(max(1, MAX_QUEUE_DEPTH // 2))))
+GRAMMAR_MIN_SENTENCES = int(os.environ.get("GRAMMAR_MIN_SENTENCES", "3"))
+
+# Post-transcription analysis stages run concurrently on this many threads
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "4"))
+
+# Max cached per-sentence LanguageTool results
+GRAMMAR_CACHE_SIZE = int(os.environ.get("GRAMMAR_CACHE_SIZE", "4096"))
+
+# Max texts per DistilBERT forward pass
+COHERENCE_BATCH_SIZE = int(os.environ.get("COHERENCE_BATCH_SIZE", "32"))
+
+# Opt-in sampling profiler: requests slower than PROFILE_SLOW_SECONDS (0 disables) leave a
+# folded-stack profile in PROFILE_DIR, ready for flamegraph.pl or speedscope
+PROFILE_SLOW_SECONDS = float(os.environ.get("PROFILE_SLOW_SECONDS", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "10"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
@@ -1,63 +1,58 @@
 
-import whisper
-import language_tool_python
-from collections import Counter
 import numpy as np
-from utils import get_language_config, get_distilbert_model
-from transformers import pipeline
-
-# Load Whisper base model
-model = whisper.load_model("base")
-
-# Initialize language tools for supported languages
-grammar_tools = {
-    "en": language_tool_python.LanguageTool('en-US'),
-    "es": language_tool_python.LanguageTool('es'),
-    "fr": language_tool_python.LanguageTool('fr'),
-    "ru": language_tool_python.LanguageTool('ru'),
-    "pt": language_tool_python.LanguageTool('pt-PT')
-}
-
-def fluency_score(timestamps, language):
-    lang_config = get_language_config(language)
-    pauses = [t['end'] - t['start'] for t in timestamps]
-    filler_words = sum(1 for t in timestamps if any(filler in t['text'].lower() for filler in lang_config["fillers"]))
+from utils import get_language_config, coherence_scores, speech_rate, split_sentences, TranscriptAnalysis
+from grammar import check_sentences
+from models import get_grammar_tool
+from transcribe import get_backend
+from vad import word_gaps
+from audio import SAMPLE_RATE
+from config import LONGFORM_WORKERS, LONGFORM_MIN_SECONDS
+
+def fluency_score(timestamps, language, pauses=None, analysis=None):
+    if analysis is None:
+        analysis = TranscriptAnalysis("".join(t["text"] for t in timestamps), timestamps, language)
+    if pauses is None:
+        pauses = [{"duration": end - start} for start, end in word_gaps(timestamps)]
+    pauses = [p["duration"] for p in pauses]
+    # Segments containing at least one filler
+    filler_words = sum(1 for found in analysis.segment_fillers if found)
     pause_score = min(9, max(1, 9 - len([p for p in pauses if p > 1.0]) * 0.5))
     filler_score = min(9, max(1, 9 - filler_words * 0.5))
     return round((pause_score + filler_score) / 2)
 
-def grammar_score(text, language):
-    lang_config = get_language_config(language)
-    if language in grammar_tools:
-        matches = grammar_tools[language].check(text)
-        error_count = len(matches)
+def grammar_score(text, language, error_count=None, coherence_score=None, analysis=None):
+    tool = get_grammar_tool(language)
+    if error_count is None and tool is not None:
+        sentences = analysis.sentences if analysis is not None else split_sentences(text)
+        matches = check_sentences(tool, sentences, language)
+        error_count = sum(len(m) for m in matches)
+    if error_count is not None:
         base_score = max(1, 9 - error_count * 0.5)
     else:
         base_score = 5  # Default for unsupported languages
 
     # Use DistilBERT for coherence scoring
-    classifier = get_distilbert_model()
-    result = classifier(text, truncation=True, max_length=512)
-    coherence_score = result[0]['score'] if result[0]['label'] == 'POSITIVE' else 1 - result[0]['score']
+    if coherence_score is None:
+        coherence_score = coherence_scores([text])[0]
     return round((base_score + coherence_score * 9) / 2)
 
-def vocab_score(text):
-    words = text.lower().split()
+def vocab_score(text, analysis=None):
+    words = analysis.words if analysis is not None else text.lower().split()
     unique_words = len(set(words))
     total_words = len(words)
     lexical_diversity = unique_words / total_words if total_words > 0 else 0
     return min(9, max(1, lexical_diversity * 10))
 
-def pronunciation_score(timestamps, language):
+def pronunciation_score(timestamps, language, analysis=None):
     lang_config = get_language_config(language)
-    total_duration = sum(t['end'] - t['start'] for t in timestamps)
-    word_count = sum(len(t['text'].split()) for t in timestamps)
-    words_per_second = word_count / total_duration if total_duration > 0 else 0
+    words_per_second = analysis.words_per_second if analysis is not None else speech_rate(timestamps)
     target_wps = lang_config["target_wps"]
     return min(9, max(1, 5 + (words_per_second - target_wps) * 2))
 
-def evaluate_speech(audio_path, language):
-    result = model.transcribe(audio_path, language=language, word_timestamps=True)
-    transcription = result["text"]
-    timestamps = result["segments"]
+def evaluate_speech(audio, language, profile=None):
+    # audio: file path or 16 kHz mono float32 samples
+    if LONGFORM_WORKERS > 1 and not isinstance(audio, str) and len(audio) >= LONGFORM_MIN_SECONDS * SAMPLE_RATE:
+        from longform import transcribe_long
+        return transcribe_long(audio, language, profile)
+    transcription, timestamps = get_backend(profile).transcribe(audio, language)
     return transcription, timestamps
@@ -1,131 +1,154 @@
-from collections import Counter
-from utils import get_language_config, get_distilbert_model
-from transformers import pipeline
-import re
-import language_tool_python
-
-# Initialize language tool for English
-tool = language_tool_python.LanguageTool('en-US')
-
-def generate_feedback(transcription, timestamps, language):
-    feedback = []
-    lang_config = get_language_config(language)
-    classifier = get_distilbert_model()
-    
-    # Split transcription into sentences for detailed analysis
-    sentences = transcription.split('.')
-    sentences = [s.strip() for s in sentences if s.strip()]
-    
-    # Check for pauses
-    for i, segment in enumerate(timestamps):
-        duration = segment['end'] - segment['start']
-        # Flag pauses longer than 2 seconds as excessive
-        if duration > 2.0:
-            feedback.append({
-                "area": "fluency",
-                "time": f"{int(segment['start']):02d}:{int(segment['start']%60):02d}–"
-                      f"{int(segment['end']):02d}:{int(segment['end']%60):02d}",
-                "issue": "Noticeable pause detected",
-                "suggestion": (
-                    "This pause might disrupt your flow. Try practicing with a timer for 30 seconds "
-                    "without stopping, but feel free to use short breaks (under 2 seconds) for natural "
-                    "pacing. Record again to see improvement!"
-                )
-            })
-    
-    # Check for filler words
-    for segment in timestamps:
-        if any(filler in segment['text'].lower() for filler in lang_config["fillers"]):
-            feedback.append({
-                "area": "fluency",
-                "time": f"{int(segment['start']):02d}:{int(segment['start']%60):02d}–"
-                      f"{int(segment['end']):02d}:{int(segment['end']%60):02d}",
-                "issue": "Use of filler words like 'um' or 'uh'",
-                "suggestion": (
-                    "Fillers can make your speech sound hesitant. Practice speaking slowly and pause "
-                    "instead of using 'um' or 'uh'. Try reading a short paragraph aloud without fillers!"
-                )
-            })
-    
+from string import Formatter
+import numpy as np
+from utils import coherence_scores, TranscriptAnalysis, LANGUAGE_CONFIGS
+from grammar import check_sentences
+from models import get_grammar_tool
+from vad import word_gaps
+
+# Pauses longer than this are flagged as excessive
+LONG_PAUSE_SECONDS = 2.0
+
+# Values each rule's templates may use; checked when the templates are compiled
+RULE_FIELDS = {
+    "long_pause": set(),
+    "filler": {"fillers"},
+    "grammar": {"message", "wrong", "replacement", "sentence", "corrected"},
+    "coherence": {"sentence"},
+    "repetitive_vocab": {"words", "tips"},
+    "speech_rate": {"rate", "target", "adjustment"}
+}
+
+def format_time(seconds):
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
+def _fields(template):
+    return {field for _, field, _, _ in Formatter().parse(template) if field}
+
+class Rule:
+    # One localized rule: its issue and suggestion templates, validated and bound once
+    def __init__(self, language, name, templates):
+        unknown = (_fields(templates["issue"]) | _fields(templates["suggestion"])) - RULE_FIELDS[name]
+        if unknown:
+            raise ValueError(f"Feedback template {language}/{name} uses unknown fields: {sorted(unknown)}")
+        self.name = name
+        self.issue = templates["issue"].format
+        self.suggestion = templates["suggestion"].format
+
+    def render(self, area, time, values, **extra):
+        item = {"area": area, "rule": self.name, "time": time,
+                "issue": self.issue(**values), "suggestion": self.suggestion(**values)}
+        item.update(extra)
+        return item
+
+class FeedbackTemplates:
+    # A language's compiled rules and labels; rules it does not translate fall back to English
+    def __init__(self, language, config, fallback=None):
+        self.rules = dict(fallback.rules) if fallback is not None else {}
+        for name, templates in config["feedback"].items():
+            self.rules[name] = Rule(language, name, templates)
+        missing = RULE_FIELDS.keys() - self.rules.keys()
+        if missing:
+            raise ValueError(f"Feedback templates for {language} lack rules: {sorted(missing)}")
+        self.sentence_label = config["labels"]["sentence"].format
+        self.throughout = config["labels"]["throughout"]
+        self.slower, self.faster = config["labels"]["slower"], config["labels"]["faster"]
+        self.corrected = config["labels"]["corrected"]
+        self.synonym_tips = config.get("synonym_tips", {})
+
+def _compile_templates():
+    english = FeedbackTemplates("en", LANGUAGE_CONFIGS["en"])
+    return {language: english if language == "en" else FeedbackTemplates(language, config, english)
+            for language, config in LANGUAGE_CONFIGS.items()}
+
+# Compiled once at import for every language
+TEMPLATES = _compile_templates()
+
+def get_templates(language):
+    return TEMPLATES.get(language, TEMPLATES["en"])
+
+def _time_labels(spans):
+    # "MM:SS–MM:SS" for every (start, end) row, minutes and seconds split in one array operation
+    minutes, seconds = np.divmod(spans.astype(np.int64), 60)
+    return [f"{m0:02d}:{s0:02d}–{m1:02d}:{s1:02d}"
+            for (m0, m1), (s0, s1) in zip(minutes.tolist(), seconds.tolist())]
+
+def segment_feedback(timestamps, segment_fillers, pauses, templates):
+    # Pause and filler rules in one pass over a (start, end, margin) array of pauses followed by
+    # segments; a rule fires where its margin is positive, and only those rows get time labels
+    if not pauses and not timestamps:
+        return []
+    table = np.array([(p["start"], p["end"], p["duration"] - LONG_PAUSE_SECONDS) for p in pauses] +
+                     [(t["start"], t["end"], len(found) - 0.5) for t, found in zip(timestamps, segment_fillers)],
+                     dtype=np.float64)
+    flagged = np.flatnonzero(table[:, 2] > 0)
+    spans = table[flagged, :2]
+    long_pause, filler = templates.rules["long_pause"], templates.rules["filler"]
+    items = []
+    for row, (start, end), label in zip(flagged.tolist(), spans.round(2).tolist(), _time_labels(spans)):
+        if row < len(pauses):
+            items.append(long_pause.render("fluency", label, {}, start=start, end=end))
+        else:
+            fillers = ", ".join(found["word"] for found in segment_fillers[row - len(pauses)])
+            items.append(filler.render("fluency", label, {"fillers": fillers}, start=start, end=end))
+    return items
+
+def generate_feedback(transcription, timestamps, language, sentence_matches=None, sentence_coherence=None,
+                      pauses=None, analysis=None):
+    if analysis is None:
+        analysis = TranscriptAnalysis(transcription, timestamps, language)
+    lang_config = analysis.config
+    templates = get_templates(language)
+
+    # Sentences were split once by the shared analysis
+    sentences = analysis.sentences
+
+    # Per-sentence checks can be shared with the grammar score; run them here only when not supplied
+    if sentence_coherence is None:
+        sentence_coherence = coherence_scores(sentences)
+    if sentence_matches is None:
+        tool = get_grammar_tool(language)
+        sentence_matches = check_sentences(tool, sentences, language) if tool else [[] for _ in sentences]
+
+    # Pauses and filler words
+    if pauses is None:
+        pauses = [{"start": start, "end": end, "duration": end - start} for start, end in word_gaps(timestamps)]
+    feedback = segment_feedback(timestamps, analysis.segment_fillers, pauses, templates)
+
     # Grammar and coherence feedback
+    grammar, coherence = templates.rules["grammar"], templates.rules["coherence"]
     for i, sentence in enumerate(sentences):
-        if sentence:  # Ensure sentence is not empty
-            # DistilBERT coherence check
-            result = classifier(sentence, truncation=True, max_length=512)
-            coherence_score = result[0]['score'] if result[0]['label'] == 'POSITIVE' else 1 - result[0]['score']
-            
-            # LanguageTool grammar check
-            matches = tool.check(sentence)
-            if matches or coherence_score < 0.7:
-                for match in matches:
-                    issue = match.message  # Specific error message (e.g., "Possible spelling mistake")
-                    offset = match.offset  # Starting position of the error
-                    error_length = match.errorLength  # Length of the erroneous text
-                    wrong_part = sentence[offset:offset + error_length]  # Extract the erroneous text
-                    replacements = match.replacements  # Suggested corrections
-                    corrected_sentence = sentence[:offset] + (replacements[0] if replacements else wrong_part) + sentence[offset + error_length:]
-                    suggestion = (
-                        f"The word or phrase '{wrong_part}' is incorrect. {issue}. "
-                        f"Try using '{replacements[0] if replacements else 'a corrected version'}' instead. "
-                        f"For example, change '{sentence}' to '{corrected_sentence}' "
-                        f"or record again with this fix. Practice this to improve!"
-                    )
-                    feedback.append({
-                        "area": "grammar",
-                        "time": f"Sentence {i+1}",
-                        "issue": issue,
-                        "suggestion": suggestion
-                    })
-                # Add coherence feedback if no specific errors but low coherence
-                if not matches and coherence_score < 0.7:
-                    suggestion = "Your sentence might be unclear. Break it into smaller parts or add details, e.g., if you said '{}', try 'I enjoy reading books'."
-                    feedback.append({
-                        "area": "grammar",
-                        "time": f"Sentence {i+1}",
-                        "issue": "Sentence may lack clarity or coherence",
-                        "suggestion": (
-                            f"{suggestion.format(sentence)} Practice recording with simpler structures "
-                            "to enhance understanding. Give it another try!"
-                        )
-                    })
-    
+        matches = sentence_matches[i]
+        if not matches and sentence_coherence[i] >= 0.7:
+            continue
+        label = templates.sentence_label(number=i + 1)
+        for match in matches:
+            # LanguageTool's message is already in the checked language
+            wrong_part = sentence[match.offset:match.offset + match.errorLength]
+            replacement = match.replacements[0] if match.replacements else None
+            corrected = sentence[:match.offset] + (replacement or wrong_part) + sentence[match.offset + match.errorLength:]
+            feedback.append(grammar.render("grammar", label, {
+                "message": match.message, "wrong": wrong_part, "replacement": replacement or templates.corrected,
+                "sentence": sentence, "corrected": corrected
+            }, sentence=i + 1))
+        # Coherence feedback if no specific errors but low coherence
+        if not matches:
+            feedback.append(coherence.render("grammar", label, {"sentence": sentence}, sentence=i + 1))
+
     # Vocabulary feedback
-    words = transcription.lower().split()
-    word_freq = Counter(words)
-    common_words = [word for word, count in word_freq.items() if count > len(words) * 0.1]
+    common_words = analysis.repeated_words()
     if common_words:
-        synonym_tips = {
-            "i": "Try 'me' or 'myself' in some places, or vary with 'my experience'.",
-            "the": "Use 'this' or 'that' to add variety.",
-            "is": "Switch with 'seems' or 'appears' for diversity."
-        }
-        tips = [synonym_tips.get(word, "Explore a thesaurus for alternatives.") for word in common_words]
-        feedback.append({
-            "area": "vocabulary",
-            "time": "Throughout",
-            "issue": f"Repetitive use of words: {', '.join(common_words)}",
-            "suggestion": (
-                f"Repeating words like {', '.join(common_words)} can limit your expressiveness. "
-                f"Here are some ideas: {'; '.join(tips)}. Practice using these in your next recording!"
-            )
-        })
-    
+        tips = [templates.synonym_tips.get(word, templates.synonym_tips.get("", "")) for word in common_words]
+        feedback.append(templates.rules["repetitive_vocab"].render("vocabulary", templates.throughout, {
+            "words": ", ".join(common_words), "tips": "; ".join(tips)
+        }))
+
     # Pronunciation feedback
-    total_duration = sum(t['end'] - t['start'] for t in timestamps)
-    word_count = sum(len(t['text'].split()) for t in timestamps)
-    words_per_second = word_count / total_duration if total_duration > 0 else 0
+    words_per_second = analysis.words_per_second
     target_wps = lang_config["target_wps"]
     if abs(words_per_second - target_wps) > 0.5:
-        adjustment = "slower" if words_per_second > target_wps else "faster"
-        feedback.append({
-            "area": "pronunciation",
-            "time": "Throughout",
-            "issue": f"Speech rate of {words_per_second:.1f} words per second differs from the target",
-            "suggestion": (
-                f"Your speech rate is a bit {adjustment} than the ideal {target_wps:.1f} words per second. "
-                f"Practice by reading a text aloud with a metronome or timer, aiming for {target_wps:.1f} words. "
-                "Record again to check your progress!"
-            )
-        })
-    
-    return feedback
\ No newline at end of file
+        feedback.append(templates.rules["speech_rate"].render("pronunciation", templates.throughout, {
+            "rate": words_per_second, "target": target_wps,
+            "adjustment": templates.slower if words_per_second > target_wps else templates.faster
+        }))
+
+    return feedback
@@ -0,0 +1,153 @@
+import copy
+import hashlib
+import itertools
+import os
+import threading
+from bisect import bisect_right
+import time
+from collections import OrderedDict
+import metrics
+from config import GRAMMAR_CACHE_SIZE, LANGUAGETOOL_POOL_SIZE, LANGUAGETOOL_TIMEOUT
+
+# Separator used when joining uncached sentences into one LanguageTool request
+SEPARATOR = ". "
+
+class MatchCache:
+    # Content-hash keyed LRU of per-sentence LanguageTool matches
+    def __init__(self, maxsize=GRAMMAR_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(language, sentence):
+        return hashlib.blake2b(f"{language}\0{sentence}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, matches):
+        with self._lock:
+            self._data[key] = matches
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def info(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+match_cache = MatchCache()
+
+class RemoteMatch:
+    # The language_tool_python.Match fields the scorers read, built from the server's JSON
+    def __init__(self, match):
+        rule = match.get("rule", {})
+        self.offset = match["offset"]
+        self.errorLength = match["length"]
+        self.message = match["message"]
+        self.replacements = [r["value"] for r in match.get("replacements", [])]
+        self.ruleId = rule.get("id")
+        self.category = rule.get("category", {}).get("id")
+        self.ruleIssueType = rule.get("issueType")
+        self.sentence = match.get("sentence")
+
+# One keep-alive session per process; a session inherited through fork is not reused
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def _get_session():
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=LANGUAGETOOL_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+def server_url(url):
+    url = url.strip().rstrip("/")
+    return url + "/" if url.endswith("/v2") else url + "/v2/"
+
+class LanguageToolClient:
+    # Drop-in for language_tool_python.LanguageTool.check() against shared LanguageTool HTTP servers,
+    # used round-robin; a server that cannot be reached, times out or errors is skipped for that request
+    def __init__(self, urls, language, timeout=LANGUAGETOOL_TIMEOUT):
+        self.urls = [server_url(url) for url in urls if url.strip()]
+        if not self.urls:
+            raise ValueError("No LanguageTool server URL configured")
+        self.language = language
+        self.timeout = timeout
+        self._next = itertools.cycle(range(len(self.urls)))
+
+    def check(self, text):
+        import requests
+        first = next(self._next)
+        error = None
+        for i in range(len(self.urls)):
+            url = self.urls[(first + i) % len(self.urls)]
+            try:
+                response = _get_session().post(url + "check", data={"language": self.language, "text": text},
+                                               timeout=self.timeout)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                # Unreachable, timed out or failing: try the next server
+                error = e
+                continue
+            return [RemoteMatch(match) for match in response.json()["matches"]]
+        raise error
+
+def check_sentences(tool, sentences, language):
+    # Returns one list of matches per sentence, with offsets relative to that sentence.
+    # All uncached sentences go to the LanguageTool server in a single check.
+    results = [None] * len(sentences)
+    keys = [MatchCache.key(language, sentence) for sentence in sentences]
+    todo = []
+    for i, key in enumerate(keys):
+        cached = match_cache.get(key)
+        if cached is None:
+            todo.append(i)
+        else:
+            results[i] = list(cached)
+    if not todo:
+        return results
+
+    starts = []
+    offset = 0
+    for i in todo:
+        starts.append(offset)
+        offset += len(sentences[i]) + len(SEPARATOR)
+    text = SEPARATOR.join(sentences[i] for i in todo)
+
+    start = time.perf_counter()
+    found = tool.check(text)
+    metrics.languagetool_requests_total.inc()
+    metrics.languagetool_seconds.observe(time.perf_counter() - start)
+
+    per_sentence = {i: [] for i in todo}
+    for match in found:
+        pos = bisect_right(starts, match.offset) - 1
+        i = todo[pos]
+        local_offset = match.offset - starts[pos]
+        if local_offset >= len(sentences[i]):
+            continue  # Falls in the separator we inserted
+        mapped = copy.copy(match)
+        mapped.offset = local_offset
+        per_sentence[i].append(mapped)
+
+    for i in todo:
+        match_cache.put(keys[i], per_sentence[i])
+        results[i] = list(per_sentence[i])
+    return results
@@ -0,0 +1,31 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py main:app
+# With PRELOAD_MODELS=1 the master loads Whisper, DistilBERT and the shared LanguageTool server before
+# forking, so every worker maps the same weights copy-on-write instead of loading its own copy.
+# Check the saving with `python bench/worker_memory.py $(cat gunicorn.pid)` or GET /models.
+import gc
+import os
+from config import WEB_WORKERS, TORCH_THREADS, PRELOAD_MODELS, WARMUP_LANGUAGES
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = WEB_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = PRELOAD_MODELS
+pidfile = "gunicorn.pid"
+# Model loading can outlast gunicorn's default 30 s worker timeout on a cold cache
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before the first fork
+    if not PRELOAD_MODELS:
+        return
+    import models
+    models.warm_up(WARMUP_LANGUAGES)
+    # Keep the collector from touching (and so copying) every preloaded object page in each worker
+    gc.freeze()
+    server.log.info("Preloaded models, master RSS %.0f MB", models.process_rss() / 1e6)
+
+def post_fork(server, worker):
+    import models
+    threads = TORCH_THREADS or max(1, (os.cpu_count() or 1) // WEB_WORKERS)
+    models.after_fork(threads)
+    server.log.info("Worker %s using %d torch threads", worker.pid, threads)
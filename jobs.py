@@ -0,0 +1,176 @@
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+import metrics
+from profiler import profile_if_slow
+from config import (EVAL_EXECUTOR, EVAL_WORKERS, MAX_QUEUE_DEPTH, JOB_TTL_SECONDS, SCHEDULER_AGING,
+                    FAST_LANE_SECONDS, FAST_LANE_WORKERS)
+
+# Queue-wait histogram labels by expected audio length
+DURATION_BUCKETS = [(30, "0-30s"), (120, "30s-2m"), (300, "2-5m"), (float("inf"), "5m+")]
+
+def duration_bucket(seconds):
+    for bound, label in DURATION_BUCKETS:
+        if seconds <= bound:
+            return label
+
+class QueueFull(Exception):
+    pass
+
+def _run_job(func, args, job_id, queue_depth):
+    # Runs inside the worker (thread or process); returns everything the job record needs
+    started_at = time.time()
+    with profile_if_slow(job_id):
+        result, timings = func(*args, queue_depth=queue_depth)
+    return {"result": result, "timings": timings, "started_at": started_at, "finished_at": time.time()}
+
+class JobQueue:
+    # Jobs wait here, not in the executor, so the next one to run can be chosen when a worker frees
+    # up: shortest expected audio first, with aging so long recordings are not starved, and
+    # fast_lane_workers workers kept for short clips. func is called as func(*args, queue_depth=n), n being
+    # the jobs still waiting when it starts.
+    def __init__(self, func, workers=EVAL_WORKERS, max_depth=MAX_QUEUE_DEPTH, executor=EVAL_EXECUTOR, ttl=JOB_TTL_SECONDS,
+                 aging=SCHEDULER_AGING, fast_lane_seconds=FAST_LANE_SECONDS, fast_lane_workers=FAST_LANE_WORKERS):
+        self.func = func
+        self.workers = workers
+        self.max_depth = max_depth
+        self.ttl = ttl
+        self.aging = aging
+        self.fast_lane_seconds = fast_lane_seconds
+        self.fast_lane_workers = min(fast_lane_workers, workers - 1)
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evaluate")
+        self._jobs = {}
+        self._futures = {}
+        # Waiting jobs per lane: heaps of (priority, sequence, job_id, args)
+        self._short = []
+        self._long = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._running_long = 0
+        self._lock = threading.Lock()
+
+    def depth(self):
+        # Jobs accepted but not yet picked up by a worker
+        with self._lock:
+            return len(self._short) + len(self._long)
+
+    def _priority(self, expected_seconds, created_at):
+        # expected - aging * waited, ordered the same way at every instant: the aging term grows
+        # equally for all waiting jobs, so it can be fixed at submission
+        return expected_seconds + self.aging * created_at
+
+    def submit(self, *args, expected_seconds=0.0):
+        # expected_seconds: estimated audio length; equal estimates run in arrival order
+        with self._lock:
+            self._prune()
+            if self._running + len(self._short) + len(self._long) >= self.workers + self.max_depth:
+                raise QueueFull()
+            job_id = str(uuid.uuid4())
+            job = {
+                "id": job_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "expected_seconds": round(expected_seconds, 2),
+                "timings": {},
+                "result": None,
+                "error": None
+            }
+            self._jobs[job_id] = job
+            self._futures[job_id] = Future()
+            lane = self._short if expected_seconds <= self.fast_lane_seconds else self._long
+            heapq.heappush(lane, (self._priority(expected_seconds, job["created_at"]), next(self._sequence), job_id, args))
+            ready = self._take()
+        self._start(ready)
+        return job
+
+    def _take(self):
+        # Called with the lock held: pick the jobs that can start now; long jobs may not use the
+        # workers kept for the fast lane
+        ready = []
+        while self._running < self.workers:
+            long_allowed = self._long and self._running_long < self.workers - self.fast_lane_workers
+            if self._short and (not long_allowed or self._short[0] < self._long[0]):
+                entry = heapq.heappop(self._short)
+                is_long = False
+            elif long_allowed:
+                entry = heapq.heappop(self._long)
+                is_long = True
+            else:
+                break
+            self._running += 1
+            self._running_long += is_long
+            self._jobs[entry[2]]["status"] = "running"
+            ready.append((entry[2], entry[3], is_long, len(self._short) + len(self._long)))
+        return ready
+
+    def _start(self, ready):
+        for job_id, args, is_long, queue_depth in ready:
+            try:
+                future = self._executor.submit(_run_job, self.func, args, job_id, queue_depth)
+            except RuntimeError as e:
+                # Shutting down
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f, job_id=job_id, is_long=is_long: self._finish(job_id, is_long, f))
+
+    def _finish(self, job_id, is_long, future):
+        with self._lock:
+            self._running -= 1
+            self._running_long -= is_long
+            ready = self._take()
+            job = self._jobs.get(job_id)
+            done = self._futures.get(job_id)
+        self._start(ready)
+        if job is None:
+            return
+        try:
+            outcome = future.result()
+        except Exception as e:
+            with self._lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                job["finished_at"] = time.time()
+            metrics.record_evaluation(job["timings"], error=e)
+            done.set_exception(e)
+            return
+        with self._lock:
+            job.update(outcome)
+            job["status"] = "done"
+            wait = outcome["started_at"] - job["created_at"]
+            job["timings"]["queue_wait"] = round(wait, 4)
+        metrics.queue_wait_seconds.observe(wait, duration_bucket(job["expected_seconds"]))
+        metrics.record_evaluation(job["timings"], elapsed=outcome["finished_at"] - outcome["started_at"])
+        done.set_result(outcome)
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._futures.pop(job_id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def future(self, job_id):
+        # Resolves when the job finishes, whether or not it has started yet
+        with self._lock:
+            return self._futures.get(job_id)
+
+    def shutdown(self):
+        with self._lock:
+            waiting, self._short, self._long = self._short + self._long, [], []
+        for _, _, job_id, _ in waiting:
+            self._futures[job_id].cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
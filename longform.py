@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from audio import SAMPLE_RATE
+from transcribe import get_backend
+from vad import silent_intervals
+from config import LONGFORM_CHUNK_SECONDS, LONGFORM_OVERLAP_SECONDS, LONGFORM_WORKERS
+
+# One pool per transcription profile, each warmed with that profile's model
+_pools = {}
+_pool_lock = threading.Lock()
+
+def _init_worker(threads, profile):
+    import torch
+    import transcribe
+    torch.set_num_threads(threads)
+    # Each worker transcribes one chunk at a time: there is nothing to batch and no batcher thread
+    transcribe.WHISPER_BATCHING = False
+    get_backend(profile).load()
+
+def _get_pool(profile):
+    # Spawned, not forked: the server is multithreaded by now, and neither the batcher's thread nor
+    # CTranslate2's native threads survive a fork. Each worker loads its own copy of the model.
+    profile = profile or None
+    with _pool_lock:
+        pool = _pools.get(profile)
+        if pool is None:
+            threads = max(1, (os.cpu_count() or 1) // LONGFORM_WORKERS)
+            pool = _pools[profile] = ProcessPoolExecutor(
+                max_workers=LONGFORM_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads, profile)
+            )
+    return pool
+
+def plan_chunks(samples, chunk_seconds=LONGFORM_CHUNK_SECONDS, overlap=LONGFORM_OVERLAP_SECONDS):
+    # Cut near every chunk_seconds, preferring the middle of a nearby silence; returns
+    # (core_start, core_end) pairs covering the recording without gaps
+    duration = len(samples) / SAMPLE_RATE
+    silences = silent_intervals(samples)
+    midpoints = silences.mean(axis=1) if len(silences) else np.zeros(0)
+    cuts = [0.0]
+    target = chunk_seconds
+    while target < duration - chunk_seconds / 4:
+        nearby = midpoints[np.abs(midpoints - target) <= chunk_seconds / 4]
+        cut = float(nearby[np.argmin(np.abs(nearby - target))]) if len(nearby) else target
+        cuts.append(cut)
+        target = cut + chunk_seconds
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def _transcribe_chunk(samples, language, profile):
+    return get_backend(profile).transcribe(samples, language)[1]
+
+def _midpoint(item):
+    return (item["start"] + item["end"]) / 2
+
+def stitch(chunk_segments, cores, offsets):
+    # Shift each chunk onto the recording timeline and keep only words whose midpoint falls in the
+    # chunk's core span, so overlap regions are not transcribed twice
+    stitched = []
+    for segments, (core_start, core_end), offset in zip(chunk_segments, cores, offsets):
+        for segment in segments:
+            words = [dict(w, start=w["start"] + offset, end=w["end"] + offset) for w in segment.get("words") or []]
+            if words:
+                words = [w for w in words if core_start <= _midpoint(w) < core_end]
+                if not words:
+                    continue
+                start, end = words[0]["start"], words[-1]["end"]
+                text = "".join(w["word"] for w in words)
+            else:
+                start, end = segment["start"] + offset, segment["end"] + offset
+                if not core_start <= (start + end) / 2 < core_end:
+                    continue
+                text = segment["text"]
+            stitched.append(dict(segment, id=len(stitched), start=start, end=end, text=text, words=words))
+    return stitched
+
+def transcribe_long(samples, language, profile=None):
+    cores = plan_chunks(samples)
+    pool = _get_pool(profile)
+    futures, offsets = [], []
+    for core_start, core_end in cores:
+        start = max(0.0, core_start - LONGFORM_OVERLAP_SECONDS)
+        end = core_end + LONGFORM_OVERLAP_SECONDS
+        chunk = samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+        futures.append(pool.submit(_transcribe_chunk, chunk, language, profile))
+        offsets.append(start)
+    # The last chunk owns everything up to the end, including words that run past the sample count
+    cores[-1] = (cores[-1][0], float("inf"))
+    segments = stitch([f.result() for f in futures], cores, offsets)
+    return "".join(s["text"] for s in segments), segments
@@ -1,73 +1,219 @@
-
+import asyncio
 import os
-import uuid
-from fastapi import FastAPI, File, UploadFile, Form
-from pydub import AudioSegment
-import evaluate  # Import the entire module
-from feedback import generate_feedback
-import json
-from datetime import datetime
+import time
+from fastapi import FastAPI, File, UploadFile, Form, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
+import metrics
+import models
+import grammar
+import planner
+from cache import result_cache
+from batcher import batcher_stats
+from audio import read_upload, header_duration, expected_duration, AudioTooLarge
+from store import get_store, PERIODS
+from config import (RECORDINGS_DIR, SUPPORTED_LANGUAGES, WARMUP_ON_STARTUP, WARMUP_LANGUAGES, MAX_STREAMS,
+                    DEADLINE_SECONDS, MAX_AUDIO_SECONDS)
+from jobs import JobQueue, QueueFull
+from pipeline import run_evaluation
+from transcribe import PROFILES
+from streaming import StreamingSession, run_step
 
 app = FastAPI()
 
-DATA_DIR = "../data"
-RECORDINGS_DIR = os.path.join(DATA_DIR, "recordings")
-HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
-
 os.makedirs(RECORDINGS_DIR, exist_ok=True)
 
+# Evaluations run on a bounded worker pool so the event loop stays free for new uploads
+jobs = JobQueue(run_evaluation)
+
+@app.on_event("startup")
+async def warm_up_models():
+    # Optional: load models for the configured languages before serving traffic
+    if WARMUP_ON_STARTUP:
+        await asyncio.to_thread(models.warm_up, WARMUP_LANGUAGES)
+
+@app.on_event("shutdown")
+def shutdown_jobs():
+    jobs.shutdown()
+
 @app.post("/evaluate")
-async def evaluate_audio(file: UploadFile = File(...), language: str = Form(...)):
+async def evaluate_audio(file: UploadFile = File(...), language: str = Form(...), profile: str = Form(None),
+                         deadline: float = Header(None, alias="X-Deadline-Seconds")):
     # Validate language
-    # supported_languages = ["en", "zh", "hi", "es", "fr", "ar", "bn", "ru", "pt", "ur"]
-    supported_languages = ["en"]
-    if language not in supported_languages:
+    if language not in SUPPORTED_LANGUAGES:
         return {"error": "Unsupported language"}
+    if profile is not None and profile not in PROFILES:
+        return {"error": f"Unsupported profile, choose one of: {', '.join(PROFILES)}"}
 
-    # Save audio file
-    audio_id = str(uuid.uuid4())
-    audio_path = os.path.join(RECORDINGS_DIR, f"test_{datetime.now().strftime('%Y-%m-%d_%H%M')}.wav")
-    
-    # Convert to wav if needed
-    audio = AudioSegment.from_file(file.file)
-    audio.export(audio_path, format="wav")
-    
-    # Evaluate speech
-    transcription, timestamps = evaluate.evaluate_speech(audio_path, language)
-    
-    # Calculate scores
-    fluency_score = evaluate.fluency_score(timestamps, language)
-    grammar_score = evaluate.grammar_score(transcription, language)
-    vocab_score = evaluate.vocab_score(transcription)
-    pronunciation_score = evaluate.pronunciation_score(timestamps, language)
-    overall_score = (fluency_score + grammar_score + vocab_score + pronunciation_score) / 4
-    
-    # Generate feedback
-    feedback = generate_feedback(transcription, timestamps, language)
-    
-    # Save to history
-    result = {
-        "timestamp": datetime.now().isoformat(),
-        "language": language,
-        "band_score": round(overall_score, 1),
-        "fluency": fluency_score,
-        "grammar": grammar_score,
-        "vocabulary": vocab_score,
-        "pronunciation": pronunciation_score,
-        "transcript": transcription,
-        "feedback": feedback,
-        "audio_path": audio_path
-    }
-    
-    # Update history.json
     try:
-        with open(HISTORY_FILE, "r") as f:
-            history = json.load(f)
-    except FileNotFoundError:
-        history = []
-    
-    history.append(result)
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
-    
-    return result
+        audio_bytes = await read_upload(file)
+    except AudioTooLarge as e:
+        metrics.requests_total.inc(label="too_large")
+        return JSONResponse(status_code=413, content={"error": str(e)})
+
+    # Length from the container header, before anything is decoded: over-long recordings are turned
+    # away here and the scheduler runs short clips first
+    duration = header_duration(audio_bytes)
+    if duration is not None and duration > MAX_AUDIO_SECONDS:
+        metrics.requests_total.inc(label="too_large")
+        return JSONResponse(status_code=413, content={"error": f"Audio exceeds {MAX_AUDIO_SECONDS} second limit"})
+    expected_seconds = duration if duration is not None else expected_duration(audio_bytes)
+
+    # Enqueue evaluation; the deadline runs from now, and the queue left waiting when the job starts
+    # tells the planner how busy we are
+    deadline = deadline if deadline is not None else DEADLINE_SECONDS
+    deadline_at = time.time() + deadline if deadline > 0 else None
+    try:
+        job = jobs.submit(audio_bytes, language, file.filename, profile, deadline_at,
+                          expected_seconds=expected_seconds)
+    except QueueFull:
+        metrics.requests_total.inc(label="rejected")
+        return JSONResponse(
+            status_code=429,
+            content={"error": "Evaluation queue is full, please retry shortly"},
+            headers={"Retry-After": "5"}
+        )
+
+    return {"job_id": job["id"], "status": job["status"]}
+
+active_streams = 0
+
+@app.websocket("/ws/evaluate")
+async def evaluate_stream(websocket: WebSocket):
+    # Protocol: a JSON config message ({"language", "sample_rate", "encoding", "profile"}), then binary
+    # PCM chunks while the user speaks, then {"event": "stop"}. The server sends "partial", "pause",
+    # "filler" and "stats" events as audio is transcribed, and a "final" event with the full result.
+    global active_streams
+    await websocket.accept()
+    if active_streams >= MAX_STREAMS:
+        await websocket.send_json({"type": "error", "error": "Too many active streams, please retry shortly"})
+        await websocket.close(code=1013)
+        return
+    active_streams += 1
+    step = None
+    try:
+        options = await websocket.receive_json()
+        language = options.get("language")
+        if language not in SUPPORTED_LANGUAGES:
+            await websocket.send_json({"type": "error", "error": "Unsupported language"})
+            return
+        try:
+            session = StreamingSession(language, int(options.get("sample_rate", 16000)),
+                                       options.get("encoding", "pcm_f32le"), options.get("profile"))
+        except ValueError as e:
+            await websocket.send_json({"type": "error", "error": str(e)})
+            return
+        await websocket.send_json({"type": "ready"})
+
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if step is not None and step.done() and not step.result():
+                # The background step failed and has reported it; the session cannot continue
+                await websocket.close(code=1011)
+                return
+            if message.get("bytes"):
+                try:
+                    session.feed(message["bytes"])
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+                    return
+                # Transcribe in the background while more audio arrives; one step at a time
+                if session.due() and (step is None or step.done()):
+                    step = asyncio.create_task(run_step(session, websocket.send_json))
+            elif message.get("text") and '"stop"' in message["text"]:
+                if step is not None and not await step:
+                    await websocket.close(code=1011)
+                    return
+                ok = await run_step(session, websocket.send_json, final=True)
+                await websocket.close(code=1000 if ok else 1011)
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if step is not None and not step.done():
+            step.cancel()
+        active_streams -= 1
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0, timings: bool = False):
+    future = jobs.future(job_id)
+    if future is not None and wait > 0:
+        # Block until the job finishes or the wait expires, without holding the event loop
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout=wait)
+        except Exception:
+            pass
+
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    # Per-stage timings are opt-in; aggregates are always available at /metrics
+    if not timings:
+        job.pop("timings", None)
+    return job
+
+@app.get("/history")
+def history(language: str = None, since: str = None, limit: int = 100, offset: int = 0, compact: bool = False):
+    limit = max(1, min(limit, 1000))
+    items = get_store().query(language=language, since=since, limit=limit, offset=offset, compact=compact)
+    return {
+        "items": items,
+        "offset": offset,
+        "next_offset": offset + len(items) if len(items) == limit else None
+    }
+
+@app.get("/progress")
+def progress(language: str, period: str = "day", points: int = 90, user: str = ""):
+    # Downsampled score series for the progress chart, read from incrementally kept aggregates
+    if period not in PERIODS:
+        return JSONResponse(status_code=400, content={"error": f"Unsupported period, choose one of: {', '.join(PERIODS)}"})
+    points = max(1, min(points, 1000))
+    return {"language": language, "period": period,
+            "points": get_store().progress(language, period=period, points=points, user=user)}
+
+@app.get("/cache")
+def cache_stats():
+    return {"results": result_cache.stats(), "grammar": grammar.match_cache.info()}
+
+@app.get("/batching")
+def batching_stats():
+    return batcher_stats()
+
+@app.get("/planner")
+def planner_stats():
+    # Recent per-unit stage costs the deadline planner works from
+    return planner.costs.snapshot()
+
+@app.get("/models")
+def loaded_models():
+    return models.model_stats()
+
+def _service_metrics():
+    lines = metrics.gauge_lines("evaluate_queue_depth", "Jobs waiting for a worker", {None: jobs.depth()})
+    lines += metrics.gauge_lines("evaluate_active_streams", "Open streaming sessions", {None: active_streams})
+    matches = grammar.match_cache.info()
+    lines += metrics.gauge_lines("grammar_cache_lookups_total", "Per-sentence LanguageTool cache lookups",
+                                 {"hit": matches["hits"], "miss": matches["misses"]}, "result", kind="counter")
+    memory = models.process_memory()
+    lines += metrics.gauge_lines("process_resident_memory_bytes", "Resident memory of this process",
+                                 {None: memory["rss_bytes"]})
+    if "pss_bytes" in memory:
+        lines += metrics.gauge_lines("process_proportional_memory_bytes",
+                                     "Proportional set size: shared pages split between the workers mapping them",
+                                     {None: memory["pss_bytes"]})
+        lines += metrics.gauge_lines("process_private_memory_bytes", "Memory only this process maps",
+                                     {None: memory["private_bytes"]})
+    for name, stats in batcher_stats().items():
+        metric = "batcher_" + name.replace("-", "_")
+        lines += [f"# TYPE {metric}_batch_size histogram"]
+        lines += metrics.render_histogram(f"{metric}_batch_size", stats["batch_size"])
+        lines += [f"# TYPE {metric}_wait_seconds histogram"]
+        lines += metrics.render_histogram(f"{metric}_wait_seconds", stats["wait_seconds"])
+    return lines
+
+metrics.register_collector(_service_metrics)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
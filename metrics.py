@@ -0,0 +1,149 @@
+import threading
+from bisect import bisect_left
+
+# Seconds buckets shared by the latency histograms
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+class Histogram:
+    # Cumulative-bucket histogram (Prometheus semantics: each bucket counts values <= its bound)
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets + [float("inf")], self.counts):
+                running += count
+                cumulative.append((bound, running))
+            return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+class Counter:
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, label=None):
+        with self._lock:
+            self.values[label] = self.values.get(label, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label, value in sorted(self.values.items(), key=lambda item: str(item[0])):
+                lines.append(f"{self.name}{_labels(self.label, label)} {value}")
+        return lines
+
+class HistogramFamily:
+    # One Histogram per value of a single label (e.g. stage)
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, label=None):
+        with self._lock:
+            histogram = self.histograms.get(label)
+            if histogram is None:
+                histogram = self.histograms[label] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self.histograms.items(), key=lambda item: str(item[0]))
+        for label, histogram in items:
+            lines.extend(render_histogram(self.name, histogram.snapshot(), self.label, label))
+        return lines
+
+def _labels(name, value, extra=""):
+    parts = [f'{name}="{value}"'] if name is not None and value is not None else []
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def render_histogram(name, snapshot, label_name=None, label=None):
+    lines = []
+    for bound, count in snapshot["buckets"]:
+        le = "+Inf" if bound == float("inf") else repr(float(bound))
+        labels = _labels(label_name, label, f'le="{le}"')
+        lines.append(f"{name}_bucket{labels} {count}")
+    lines.append(f"{name}_sum{_labels(label_name, label)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(label_name, label)} {snapshot['count']}")
+    return lines
+
+_registry = []
+_collectors = []
+
+def register_collector(collector):
+    # collector() returns extra exposition lines computed at scrape time (gauges, external counters)
+    _collectors.append(collector)
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+def gauge_lines(name, help, values, label_name=None, kind="gauge"):
+    # values: {label_value_or_None: number}
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for label, value in values.items():
+        lines.append(f"{name}{_labels(label_name, label)} {value}")
+    return lines
+
+requests_total = Counter("evaluate_requests_total", "Evaluation requests by outcome", label="status")
+errors_total = Counter("evaluate_errors_total", "Failed evaluations by exception type", label="error")
+cache_lookups_total = Counter("evaluate_result_cache_total", "Result cache lookups", label="result")
+audio_seconds_total = Counter("evaluate_audio_seconds_total", "Seconds of audio evaluated")
+stage_seconds = HistogramFamily("evaluate_stage_seconds", "Time spent per pipeline stage", label="stage")
+realtime_factor = HistogramFamily("evaluate_realtime_factor", "Processing time divided by audio duration",
+                                  buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5])
+languagetool_requests_total = Counter("languagetool_requests_total", "Round trips to the LanguageTool server")
+languagetool_seconds = HistogramFamily("languagetool_request_seconds", "LanguageTool round-trip latency")
+coherence_batches_total = Counter("coherence_forward_passes_total", "DistilBERT forward passes")
+coherence_texts_total = Counter("coherence_texts_total", "Texts scored by DistilBERT")
+queue_wait_seconds = HistogramFamily("evaluate_queue_wait_seconds", "Time from submission to start, by expected audio length",
+                                     buckets=LATENCY_BUCKETS + [300, 600], label="duration")
+degraded_total = Counter("evaluate_degraded_total", "Evaluations that degraded a stage to meet their deadline",
+                         label="stage")
+
+def record_evaluation(timings, elapsed=None, error=None):
+    # Called once per finished evaluation with its timing record. Timing records mix stage
+    # durations with labels such as the cache outcome and the audio length.
+    if error is not None:
+        requests_total.inc(label="failed")
+        errors_total.inc(label=type(error).__name__)
+        return
+    requests_total.inc(label="done")
+    for stage, value in timings.items():
+        if stage != "audio_seconds" and isinstance(value, (int, float)):
+            stage_seconds.observe(value, stage)
+    if timings.get("cache"):
+        cache_lookups_total.inc(label=timings["cache"])
+    for stage in timings.get("degraded", ()):
+        degraded_total.inc(label=stage)
+    audio_seconds = timings.get("audio_seconds")
+    if audio_seconds:
+        audio_seconds_total.inc(audio_seconds)
+        if elapsed is not None:
+            realtime_factor.observe(elapsed / audio_seconds)
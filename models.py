@@ -0,0 +1,266 @@
+import atexit
+import contextlib
+import fcntl
+import json
+import os
+import resource
+import shutil
+import sys
+import threading
+import time
+from config import (WHISPER_MODEL, DISTILBERT_MODEL, LANGUAGE_TOOL_CODES, SCORING_VERSION, LANGUAGETOOL_URL,
+                    LANGUAGETOOL_SHARED, COHERENCE_ENGINE, ONNX_CACHE_DIR, COHERENCE_THREADS)
+
+# Loaded models by name; each entry records how long the load took and how much memory it added
+_models = {}
+_locks = {}
+_registry_lock = threading.Lock()
+# Intra-op threads per process, set by after_fork in multi-worker serving
+_worker_threads = None
+
+def process_rss(pid="self"):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        if pid != "self":
+            return None
+        # ru_maxrss is in kilobytes on Linux (peak, not current)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def process_memory(pid="self"):
+    # Resident, proportional (shared pages split between the processes mapping them) and private
+    # memory. PSS is what each worker really costs once model weights are shared copy-on-write.
+    fields = {"Rss": "rss_bytes", "Pss": "pss_bytes", "Private_Clean": "private_bytes",
+              "Private_Dirty": "private_bytes", "Shared_Clean": "shared_bytes", "Shared_Dirty": "shared_bytes"}
+    memory = {"rss_bytes": 0, "pss_bytes": 0, "private_bytes": 0, "shared_bytes": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    memory[fields[name]] += int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        return {"rss_bytes": process_rss(pid)}
+    return memory
+
+def _load(name, loader, pid_of=None):
+    entry = _models.get(name)
+    if entry is not None:
+        return entry["model"]
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        entry = _models.get(name)
+        if entry is None:
+            rss_before = process_rss()
+            start = time.perf_counter()
+            model = loader()
+            entry = {
+                "model": model,
+                "load_seconds": round(time.perf_counter() - start, 3),
+                "rss_delta_bytes": process_rss() - rss_before,
+                "loaded_at": time.time(),
+                "pid_of": pid_of
+            }
+            _models[name] = entry
+    return entry["model"]
+
+def get_whisper_model(size=WHISPER_MODEL):
+    import whisper
+    return _load(f"whisper:{size}", lambda: whisper.load_model(size, device="cpu"))
+
+def _quantize_whisper(size):
+    import torch
+    import whisper
+    model = whisper.load_model(size, device="cpu")
+    # whisper.model.Linear subclasses nn.Linear, which quantize_dynamic skips; swap in plain
+    # nn.Linear layers sharing the same weights first
+    for parent in list(model.modules()):
+        for child_name, child in list(parent.named_children()):
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(parent, child_name, linear)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def get_quantized_whisper_model(size=WHISPER_MODEL):
+    return _load(f"whisper-int8:{size}", lambda: _quantize_whisper(size))
+
+def get_faster_whisper_model(size=WHISPER_MODEL):
+    from faster_whisper import WhisperModel
+    return _load(f"faster-whisper-int8:{size}", lambda: WhisperModel(size, device="cpu", compute_type="int8"))
+
+def _tool_server_pid(tool):
+    # Local LanguageTool instances run in their own JVM process
+    server = getattr(tool, "_server", None)
+    return getattr(server, "pid", None)
+
+def _start_languagetool_server():
+    import language_tool_python
+    # The server checks every language; the instance's own language is only its default
+    return language_tool_python.LanguageTool(LANGUAGE_TOOL_CODES["en"])
+
+def get_grammar_tool(language):
+    code = LANGUAGE_TOOL_CODES.get(language)
+    if code is None:
+        return None
+    from grammar import LanguageToolClient
+    if LANGUAGETOOL_URL:
+        return _load(f"languagetool:{code}", lambda: LanguageToolClient(LANGUAGETOOL_URL.split(","), code))
+    if LANGUAGETOOL_SHARED:
+        # One JVM for all languages, started by whichever process loads it first (the gunicorn master
+        # when preloading) and reached over HTTP by every worker
+        def connect():
+            server = _load("languagetool-server", _start_languagetool_server, pid_of=_tool_server_pid)
+            return LanguageToolClient([server._url], code)
+        return _load(f"languagetool:{code}", connect)
+    import language_tool_python
+    return _load(f"languagetool:{code}", lambda: language_tool_python.LanguageTool(code), pid_of=_tool_server_pid)
+
+def get_distilbert_model():
+    from transformers import pipeline
+    return _load(
+        "distilbert",
+        lambda: pipeline("text-classification", model=DISTILBERT_MODEL, framework="pt")
+    )
+
+def onnx_coherence_dir(model_name=DISTILBERT_MODEL):
+    return os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--") + "-int8")
+
+@contextlib.contextmanager
+def _file_lock(path):
+    # Exclusive between processes for as long as the block runs
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+def export_coherence_onnx(directory, classifier=None, replace=True):
+    # Export the classifier to ONNX, quantize its weights to int8 and save it with its tokenizer and
+    # label map. Built in a per-process directory and published with one rename under a file lock, so
+    # a half-finished export is never loaded. With replace=False an export another process published
+    # first is kept (it may already be loaded) and this one is discarded.
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    classifier = classifier or get_distilbert_model()
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    inputs = classifier.tokenizer(["export sample"], return_tensors="pt")
+    model = classifier.model.eval()
+    with torch.inference_mode():
+        torch.onnx.export(
+            model, (inputs["input_ids"], inputs["attention_mask"]), os.path.join(tmp, "model-fp32.onnx"),
+            input_names=["input_ids", "attention_mask"], output_names=["logits"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+                          "logits": {0: "batch"}},
+            opset_version=17, dynamo=False
+        )
+    quantize_dynamic(os.path.join(tmp, "model-fp32.onnx"), os.path.join(tmp, "model.onnx"), weight_type=QuantType.QInt8)
+    os.remove(os.path.join(tmp, "model-fp32.onnx"))
+    classifier.tokenizer.save_pretrained(tmp)
+    with open(os.path.join(tmp, "labels.json"), "w") as f:
+        json.dump({str(i): label for i, label in model.config.id2label.items()}, f)
+    with _file_lock(directory + ".lock"):
+        if not replace and os.path.exists(os.path.join(directory, "model.onnx")):
+            shutil.rmtree(tmp)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(tmp, directory)
+    return directory
+
+class OnnxClassifier:
+    # Tokenizer, label map and an ONNX Runtime session for the int8 export. The session is created per
+    # process: its thread pool does not survive a fork.
+    def __init__(self, directory, threads=COHERENCE_THREADS):
+        from transformers import AutoTokenizer
+        self.directory = directory
+        self.threads = threads
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        with open(os.path.join(directory, "labels.json")) as f:
+            self.id2label = {int(i): label for i, label in json.load(f).items()}
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        self.session  # Created now so the load stats include it
+
+    @property
+    def session(self):
+        if self._session_pid != os.getpid():
+            with self._lock:
+                if self._session_pid != os.getpid():
+                    import onnxruntime
+                    options = onnxruntime.SessionOptions()
+                    options.intra_op_num_threads = self.threads or _worker_threads or os.cpu_count() or 1
+                    options.inter_op_num_threads = 1
+                    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+                    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    self._session = onnxruntime.InferenceSession(
+                        os.path.join(self.directory, "model.onnx"), options, providers=["CPUExecutionProvider"])
+                    self._session_pid = os.getpid()
+        return self._session
+
+def _load_onnx_coherence():
+    directory = onnx_coherence_dir()
+    if not os.path.exists(os.path.join(directory, "model.onnx")):
+        # Processes loading without preloading may export at the same time; the first to finish wins
+        export_coherence_onnx(directory, replace=False)
+    return OnnxClassifier(directory)
+
+def get_onnx_coherence_model():
+    return _load("distilbert-onnx-int8", _load_onnx_coherence)
+
+def get_coherence_model(engine=COHERENCE_ENGINE):
+    if engine == "onnx-int8":
+        return get_onnx_coherence_model()
+    if engine != "pytorch":
+        raise ValueError(f"Unknown coherence engine: {engine}")
+    return get_distilbert_model()
+
+def version_tag(transcriber=f"reference:{WHISPER_MODEL}"):
+    # Identifies everything a cached result depends on besides the audio and language
+    coherence = DISTILBERT_MODEL if COHERENCE_ENGINE == "pytorch" else f"{DISTILBERT_MODEL}+{COHERENCE_ENGINE}"
+    return f"whisper={transcriber};coherence={coherence};scoring={SCORING_VERSION}"
+
+def warm_up(languages):
+    from transcribe import get_backend
+    get_backend().load()
+    get_coherence_model()
+    for language in languages:
+        get_grammar_tool(language)
+
+def _release_inherited_servers():
+    # language_tool_python kills every server it started from an atexit hook, and a forked child
+    # inherits that list: drop it so a recycled worker does not take the parent's shared JVM down
+    lt_server = sys.modules.get("language_tool_python.server")
+    if lt_server is None:
+        return
+    lt_server.RUNNING_SERVER_PROCESSES.clear()
+    atexit.unregister(lt_server.terminate_server)
+
+def after_fork(threads):
+    # Called in each forked worker: the parent's thread counts would oversubscribe the cores, and
+    # the servers the parent started stay the parent's to stop
+    global _worker_threads
+    _release_inherited_servers()
+    _worker_threads = threads
+    import torch
+    torch.set_num_threads(threads)
+
+def model_stats():
+    stats = []
+    for name, entry in list(_models.items()):
+        item = {
+            "name": name,
+            "load_seconds": entry["load_seconds"],
+            "rss_delta_bytes": entry["rss_delta_bytes"],
+            "loaded_at": entry["loaded_at"]
+        }
+        if entry["pid_of"] is not None:
+            pid = entry["pid_of"](entry["model"])
+            item["server_pid"] = pid
+            item["server_rss_bytes"] = process_rss(pid) if pid else None
+        stats.append(item)
+    return {"pid": os.getpid(), "process_rss_bytes": process_rss(), "memory": process_memory(), "models": stats}
@@ -0,0 +1,119 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import evaluate
+from analysis import analyze
+import planner
+import recordings
+from audio import decode_audio, duration_seconds
+from cache import audio_key, result_cache
+from models import version_tag
+from transcribe import get_backend
+from vad import trim_silence, detect_pauses, shift_timestamps
+from store import get_store
+from config import ARCHIVE_UPLOADS, TRIM_SILENCE
+
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 4)
+
+def score_transcript(transcription, timestamps, language, pauses, timings, plan=None):
+    # Calculate scores and generate feedback; independent stages run in parallel
+    with timed(timings, "analysis"):
+        analysis = analyze(transcription, timestamps, language, timings, pauses=pauses, plan=plan)
+    planner.observe(timings, timings.get("transcriber"), len(analysis["text"].sentences), plan)
+    fluency_score = analysis["fluency"]
+    grammar_score = analysis["grammar"]
+    vocab_score = analysis["vocabulary"]
+    pronunciation_score = analysis["pronunciation"]
+    feedback = analysis["feedback"]
+    overall_score = (fluency_score + grammar_score + vocab_score + pronunciation_score) / 4
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "language": language,
+        "band_score": round(overall_score, 1),
+        "fluency": fluency_score,
+        "grammar": grammar_score,
+        "vocabulary": vocab_score,
+        "pronunciation": pronunciation_score,
+        "transcript": transcription,
+        "feedback": feedback,
+        "pauses": pauses,
+        "audio_path": None,
+        "degraded": dict(plan.degraded) if plan is not None else {}
+    }
+
+def evaluate_samples(samples, language, profile, timings, plan=None):
+    # Score decoded 16 kHz audio; no caching, archiving or history (shared with bulk scoring)
+
+    # Whisper only needs the part between the first and last speech
+    offset = 0.0
+    if TRIM_SILENCE:
+        with timed(timings, "trim"):
+            samples, offset = trim_silence(samples)
+
+    # Evaluate speech, with a cheaper engine if the deadline calls for one
+    if plan is not None:
+        profile = plan.transcriber(profile, duration_seconds(samples))
+        timings["transcriber"] = get_backend(profile).tag
+    with timed(timings, "transcribe"):
+        transcription, timestamps = evaluate.evaluate_speech(samples, language, profile)
+
+    # Real silences between words, on the original recording's timeline
+    with timed(timings, "pauses"):
+        pauses = detect_pauses(samples, timestamps)
+        for pause in pauses:
+            pause["start"] = round(pause["start"] + offset, 2)
+            pause["end"] = round(pause["end"] + offset, 2)
+        shift_timestamps(timestamps, offset)
+
+    return score_transcript(transcription, timestamps, language, pauses, timings, plan)
+
+def run_evaluation(audio_bytes, language, filename=None, profile=None, deadline_at=None, queue_depth=0):
+    timings = {}
+
+    # Decode once to 16 kHz mono float32 for Whisper
+    with timed(timings, "decode"):
+        samples = decode_audio(audio_bytes)
+    timings["audio_seconds"] = round(duration_seconds(samples), 2)
+
+    # Archive the recording in the background; nothing waits on the encode or write
+    audio_path = recordings.store(audio_bytes, samples, filename) if ARCHIVE_UPLOADS else None
+
+    # Identical audio scored by the same models gives the same result
+    backend = get_backend(profile)
+    timings["transcriber"] = backend.tag
+    key = audio_key(samples, language, version_tag(backend.tag))
+    cached = result_cache.get(key)
+    if cached is not None:
+        timings["cache"] = "hit"
+        result = {"timestamp": datetime.now().isoformat(), "language": language}
+        result.update(cached)
+        result["audio_path"] = audio_path
+        result["degraded"] = {}
+        with timed(timings, "history"):
+            get_store().append(result)
+        return result, timings
+    timings["cache"] = "miss"
+
+    # The deadline counts from submission, so time spent queued is already gone; queue_depth is the
+    # load now, as the job queue saw it when this job started
+    plan = planner.Plan(deadline_at, queue_depth) if deadline_at is not None else None
+    result = evaluate_samples(samples, language, profile, timings, plan)
+    result["audio_path"] = audio_path
+    if result["degraded"]:
+        timings["degraded"] = sorted(result["degraded"])
+    else:
+        # Degraded results are not what the same audio would get with time to spare
+        result_cache.put(key, result)
+
+    # Save to history
+    with timed(timings, "history"):
+        get_store().append(result)
+
+    return result, timings
@@ -0,0 +1,118 @@
+# Deadline-aware degradation. Every evaluation may carry a deadline; before transcription and again
+# before analysis, the plan compares the time left with what the remaining stages have recently cost
+# and drops or simplifies optional work so the result is ready in time. What was given up is listed
+# in the result's "degraded" field.
+import statistics
+import threading
+import time
+from collections import deque
+from transcribe import get_backend
+from config import (DEADLINE_MARGIN, DEGRADE_PROFILE, DEGRADE_QUEUE_DEPTH, GRAMMAR_MIN_SENTENCES)
+
+# Per-unit costs assumed until MIN_SAMPLES requests have been observed: transcription and full
+# analysis per audio second, LanguageTool per sentence checked, DistilBERT per text
+PRIORS = {"transcribe": 0.3, "analysis": 0.05, "matches": 0.05, "coherence": 0.01}
+MIN_SAMPLES = 5
+# Floor on a per-unit cost, so budgets divided by it stay finite
+MIN_UNIT_COST = 1e-4
+
+class StageCosts:
+    # Recent seconds-per-unit for each stage; the median of the last `size` requests follows load
+    # changes without jumping on one slow request
+    def __init__(self, size=50):
+        self.size = size
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, seconds, units):
+        # A stage that did no work (cached grammar results, no LanguageTool for the language) times
+        # as 0 s and says nothing about what the work costs
+        if not units or not isinstance(seconds, (int, float)) or seconds <= 0:
+            return
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.size)).append(seconds / units)
+
+    def known(self, key):
+        with self._lock:
+            return len(self._samples.get(key, ())) >= MIN_SAMPLES
+
+    def cost(self, key, units, prior):
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        per_unit = statistics.median(samples) if len(samples) >= MIN_SAMPLES else prior
+        return max(per_unit, MIN_UNIT_COST) * units
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {"n": len(samples), "median": round(statistics.median(samples), 5)}
+                    for key, samples in self._samples.items() if samples}
+
+costs = StageCosts()
+
+class Plan:
+    def __init__(self, deadline_at=None, queue_depth=0):
+        self.deadline_at = deadline_at
+        self.queue_depth = queue_depth
+        self.grammar_sentences = None  # Check only the first N sentences
+        self.sentence_coherence = True
+        self.degraded = {}
+
+    def remaining(self):
+        return None if self.deadline_at is None else self.deadline_at - time.time()
+
+    def _short(self, needed):
+        return needed > self.remaining() * DEADLINE_MARGIN
+
+    def _busy(self):
+        # Enough jobs waiting that finishing this one quickly matters more than its optional work
+        return self.queue_depth >= DEGRADE_QUEUE_DEPTH
+
+    def transcriber(self, profile, audio_seconds):
+        # Profile to transcribe with: the requested one, or DEGRADE_PROFILE when the requested
+        # engine plus the analysis would not fit
+        if self.deadline_at is None:
+            return profile
+        backend = get_backend(profile)
+        needed = (costs.cost(f"transcribe:{backend.tag}", audio_seconds, PRIORS["transcribe"])
+                  + costs.cost("analysis", audio_seconds, PRIORS["analysis"]))
+        if not (self._short(needed) or self._busy()):
+            return profile
+        fallback = get_backend(DEGRADE_PROFILE)
+        if fallback.tag == backend.tag:
+            return profile
+        # The fallback is assumed cheaper until both have been measured
+        if costs.known(f"transcribe:{fallback.tag}") and costs.known(f"transcribe:{backend.tag}") and \
+                costs.cost(f"transcribe:{fallback.tag}", 1, 0) >= costs.cost(f"transcribe:{backend.tag}", 1, 0):
+            return profile
+        self.degraded["transcribe"] = f"used {fallback.tag} instead of {backend.tag}"
+        return DEGRADE_PROFILE
+
+    def analysis(self, sentence_count):
+        # Decide the optional analysis work once the sentence count is known
+        if self.deadline_at is None or not sentence_count:
+            return
+        matches = costs.cost("matches", sentence_count, PRIORS["matches"])
+        coherence = costs.cost("coherence", sentence_count + 1, PRIORS["coherence"])
+        # LanguageTool and DistilBERT run side by side; the slower one bounds the analysis
+        if not (self._short(max(matches, coherence)) or self._busy()):
+            return
+        self.sentence_coherence = False
+        self.degraded["coherence"] = "per-sentence coherence feedback skipped"
+        if self._short(matches):
+            fits = int(max(0.0, self.remaining()) * DEADLINE_MARGIN / costs.cost("matches", 1, PRIORS["matches"]))
+            limit = max(GRAMMAR_MIN_SENTENCES, fits)
+            if limit < sentence_count:
+                self.grammar_sentences = limit
+                self.degraded["grammar"] = f"checked the first {limit} of {sentence_count} sentences"
+
+def observe(timings, transcriber, sentence_count, plan=None):
+    # Feed a finished evaluation's stage timings back into the cost model
+    audio_seconds = timings.get("audio_seconds")
+    if audio_seconds:
+        costs.observe(f"transcribe:{transcriber}", timings.get("transcribe"), audio_seconds)
+        if plan is None or not plan.degraded.keys() - {"transcribe"}:
+            costs.observe("analysis", timings.get("analysis"), audio_seconds)
+    checked = sentence_count if plan is None or plan.grammar_sentences is None else plan.grammar_sentences
+    costs.observe("matches", timings.get("matches"), checked)
+    coherence_texts = sentence_count + 1 if plan is None or plan.sentence_coherence else 1
+    costs.observe("coherence", timings.get("coherence"), coherence_texts)
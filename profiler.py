@@ -0,0 +1,85 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from config import PROFILE_SLOW_SECONDS, PROFILE_INTERVAL_MS, PROFILE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Worker threads that do part of a request's work besides the thread that runs the job
+HELPER_THREAD_PREFIXES = ("analysis", "batcher")
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    # Samples Python stacks every interval and aggregates them as folded stacks
+    # ("thread;outer;...;inner count"), the input format of flamegraph.pl and speedscope.
+    # Helper threads are shared by concurrent jobs, so their samples may include other requests.
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sampled_threads(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, name in names.items():
+            if ident == self.thread_id or name.startswith(HELPER_THREAD_PREFIXES):
+                yield ident, name
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for ident, name in self._sampled_threads():
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join([name] + stack[::-1])] += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.folded())
+        return path
+
+@contextmanager
+def profile_if_slow(name, threshold=PROFILE_SLOW_SECONDS):
+    # Opt-in (threshold > 0): profile the block and keep the profile only when it ran too long
+    if threshold <= 0:
+        yield
+        return
+    profiler = SamplingProfiler(threading.get_ident())
+    profiler.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        elapsed = time.perf_counter() - start
+        if elapsed >= threshold:
+            path = profiler.dump(os.path.join(PROFILE_DIR, f"{name}.folded"))
+            logger.warning("Slow request %s took %.2fs; profile written to %s", name, elapsed, path)
@@ -0,0 +1,153 @@
+# Recording archive. Files are named by a hash of their content (<RECORDINGS_DIR>/<ab>/<hash>.<ext>),
+# so uploads never overwrite each other and re-uploads are stored once. Encoding runs on a background
+# thread from the already-decoded samples. Retention tiers are applied by `python recordings.py compact`
+# (run it from cron): full quality for RECORDING_FULL_DAYS, then low-bitrate Opus, then deletion.
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from audio import SAMPLE_RATE, decode_audio
+from config import (RECORDINGS_DIR, RECORDING_FORMAT, RECORDING_OPUS_BITRATE, RECORDING_COMPACT_BITRATE,
+                    RECORDING_FULL_DAYS, RECORDING_DELETE_DAYS)
+
+logger = logging.getLogger(__name__)
+
+# Full-quality tier extensions per format; ".opus" is reserved for the compacted tier
+FORMATS = {
+    "flac": (".flac", ["-c:a", "flac", "-compression_level", "8", "-f", "flac"]),
+    "opus": (".ogg", ["-c:a", "libopus", "-b:a", RECORDING_OPUS_BITRATE, "-application", "voip", "-f", "ogg"]),
+}
+COMPACT_EXTENSION = ".opus"
+COMPACT_CODEC = ["-c:a", "libopus", "-b:a", RECORDING_COMPACT_BITRATE, "-application", "voip", "-f", "ogg"]
+
+# Archive writes happen off the request path
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def _path_for(key, ext):
+    return os.path.join(RECORDINGS_DIR, key[:2], key + ext)
+
+def _existing(path):
+    # The same recording under any extension (a tier change re-encodes it under a new one)
+    stem = os.path.splitext(path)[0]
+    matches = [p for p in glob.glob(glob.escape(stem) + ".*") if not p.endswith(".tmp")]
+    return matches[0] if matches else None
+
+def _encode(samples, path, codec):
+    # 16 kHz float32 samples straight into ffmpeg; no WAV intermediate
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+           "-f", "f32le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0"] + codec + [path]
+    process = subprocess.run(cmd, input=samples.tobytes(), capture_output=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to encode {path}: {process.stderr.decode(errors='ignore').strip()}")
+
+def _write(path, samples=None, data=None, codec=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    try:
+        if data is not None:
+            with open(tmp, "wb") as f:
+                f.write(data)
+        else:
+            _encode(samples, tmp, codec)
+        os.replace(tmp, path)
+    except Exception:
+        logger.exception("Archiving %s failed", path)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def store(data, samples, filename=None, fmt=RECORDING_FORMAT):
+    # Returns the path the recording will be written to
+    if fmt == "original":
+        ext = os.path.splitext(filename or "")[1].lower() or ".wav"
+        path = _path_for(content_key(data), ext)
+    else:
+        ext, codec = FORMATS[fmt]
+        path = _path_for(content_key(samples.tobytes()), ext)
+    existing = _existing(path)
+    if existing is not None:
+        # Already archived: refresh its age instead of writing it again. Compaction may have just
+        # deleted or re-encoded it; then it is written again below.
+        try:
+            os.utime(existing)
+            return existing
+        except FileNotFoundError:
+            pass
+    if fmt == "original":
+        _executor.submit(_write, path, data=data)
+    else:
+        _executor.submit(_write, path, samples=samples, codec=codec)
+    return path
+
+def load(path):
+    # Decoded 16 kHz float32 samples of an archived recording, whatever tier it is in now
+    resolved = path if os.path.exists(path) else _existing(path)
+    if resolved is None:
+        raise FileNotFoundError(path)
+    with open(resolved, "rb") as f:
+        return decode_audio(f.read())
+
+def compact(full_days=RECORDING_FULL_DAYS, delete_days=RECORDING_DELETE_DAYS, dry_run=False, now=None):
+    # Apply the retention tiers to everything under RECORDINGS_DIR, including legacy
+    # test_<date>.wav files; compacted files keep their name stem so stored paths still resolve
+    now = now or time.time()
+    stats = {"kept": 0, "compacted": 0, "deleted": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+    for root, _, names in os.walk(RECORDINGS_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith(".tmp"):
+                continue
+            size = os.path.getsize(path)
+            age_days = (now - os.path.getmtime(path)) / 86400
+            stats["bytes_before"] += size
+            if delete_days and age_days >= delete_days:
+                stats["deleted"] += 1
+                if not dry_run:
+                    os.remove(path)
+                continue
+            if not full_days or age_days < full_days or name.endswith(COMPACT_EXTENSION):
+                stats["kept"] += 1
+                stats["bytes_after"] += size
+                continue
+            target = os.path.splitext(path)[0] + COMPACT_EXTENSION
+            if dry_run:
+                stats["compacted"] += 1
+                continue
+            try:
+                with open(path, "rb") as f:
+                    samples = decode_audio(f.read())
+                _encode(samples, target + ".tmp", COMPACT_CODEC)
+                os.replace(target + ".tmp", target)
+                # Keep the original age so deletion still happens on schedule
+                mtime = os.path.getmtime(path)
+                os.utime(target, (mtime, mtime))
+                os.remove(path)
+                stats["compacted"] += 1
+                stats["bytes_after"] += os.path.getsize(target)
+            except Exception as e:
+                logger.warning("Compacting %s failed: %s", path, e)
+                stats["failed"] += 1
+                stats["bytes_after"] += size
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Recording archive maintenance")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--full-days", type=float, default=RECORDING_FULL_DAYS)
+    parser.add_argument("--delete-days", type=float, default=RECORDING_DELETE_DAYS)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    stats = compact(args.full_days, args.delete_days, args.dry_run)
+    summary = f"kept {stats['kept']}, compacted {stats['compacted']}, deleted {stats['deleted']}, failed {stats['failed']}"
+    if not args.dry_run:
+        summary += f"; {stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB"
+    print(summary)
+
+if __name__ == "__main__":
+    main()
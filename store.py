@@ -0,0 +1,256 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from config import RESULTS_STORE, RESULTS_DB, RESULTS_JSONL, HISTORY_FILE
+
+# Score columns kept outside the JSON payload so they can be filtered and charted cheaply
+SUMMARY_FIELDS = ["timestamp", "language", "band_score", "fluency", "grammar", "vocabulary", "pronunciation"]
+
+# Progress aggregates: per user (empty until results carry one), language, period and bucket, the
+# number of tests, band score sum and best, and skill sums over the results that have every skill
+PERIODS = ("day", "week")
+SKILLS = ("fluency", "grammar", "vocabulary", "pronunciation")
+
+def period_bucket(timestamp, period):
+    # Day: the ISO date; week: the date of its Monday
+    day = timestamp[:10]
+    if period == "week":
+        parsed = date.fromisoformat(day)
+        return (parsed - timedelta(days=parsed.weekday())).isoformat()
+    return day
+
+def progress_row(result, period):
+    # (key, tests, band_sum, band_best, scored, *skill_sums) contributed by one result
+    skills = [result.get(skill) for skill in SKILLS]
+    scored = all(value is not None for value in skills)
+    key = (result.get("user") or "", result["language"], period, period_bucket(result["timestamp"], period))
+    return (key, 1, result["band_score"], result["band_score"], int(scored)) + \
+        tuple(value if scored else 0.0 for value in skills)
+
+def progress_point(bucket, tests, band_sum, band_best, scored, *skill_sums):
+    point = {"bucket": bucket, "tests": tests, "band_mean": round(band_sum / tests, 2), "band_best": band_best}
+    for skill, total in zip(SKILLS, skill_sums):
+        point[skill] = round(total / scored, 2) if scored else None
+    return point
+
+class ResultsStore:
+    def append(self, result):
+        raise NotImplementedError
+
+    def query(self, language=None, since=None, limit=100, offset=0, compact=False):
+        raise NotImplementedError
+
+    def progress(self, language, period="day", points=90, user=""):
+        # The last `points` buckets of the aggregates, oldest first
+        raise NotImplementedError
+
+    def migrate_history_json(self, path=HISTORY_FILE):
+        # One-time import of the legacy history.json into an empty store
+        if not os.path.exists(path) or self.query(limit=1):
+            return 0
+        with open(path, "r") as f:
+            history = json.load(f)
+        for result in history:
+            self.append(result)
+        return len(history)
+
+class SQLiteStore(ResultsStore):
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                language TEXT NOT NULL,
+                band_score REAL,
+                fluency REAL,
+                grammar REAL,
+                vocabulary REAL,
+                pronunciation REAL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_language_timestamp ON results (language, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results (timestamp);
+            CREATE TABLE IF NOT EXISTS progress (
+                user TEXT NOT NULL,
+                language TEXT NOT NULL,
+                period TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                tests INTEGER NOT NULL,
+                band_sum REAL NOT NULL,
+                band_best REAL NOT NULL,
+                scored INTEGER NOT NULL,
+                fluency_sum REAL NOT NULL,
+                grammar_sum REAL NOT NULL,
+                vocabulary_sum REAL NOT NULL,
+                pronunciation_sum REAL NOT NULL,
+                PRIMARY KEY (user, language, period, bucket)
+            ) WITHOUT ROWID;
+        """)
+        self._backfill_progress(conn)
+
+    def _backfill_progress(self, conn):
+        # Results stored before the aggregates existed are folded in once
+        if conn.execute("SELECT 1 FROM progress LIMIT 1").fetchone() or \
+                not conn.execute("SELECT 1 FROM results LIMIT 1").fetchone():
+            return
+        with conn:
+            for (payload,) in conn.execute("SELECT payload FROM results ORDER BY id").fetchall():
+                self._add_progress(conn, json.loads(payload))
+
+    def _add_progress(self, conn, result):
+        for period in PERIODS:
+            key, *values = progress_row(result, period)
+            conn.execute("""
+                INSERT INTO progress VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user, language, period, bucket) DO UPDATE SET
+                    tests = tests + excluded.tests,
+                    band_sum = band_sum + excluded.band_sum,
+                    band_best = max(band_best, excluded.band_best),
+                    scored = scored + excluded.scored,
+                    fluency_sum = fluency_sum + excluded.fluency_sum,
+                    grammar_sum = grammar_sum + excluded.grammar_sum,
+                    vocabulary_sum = vocabulary_sum + excluded.vocabulary_sum,
+                    pronunciation_sum = pronunciation_sum + excluded.pronunciation_sum
+            """, list(key) + values)
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers run alongside the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, result):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO results (timestamp, language, band_score, fluency, grammar, vocabulary, pronunciation, payload)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [result.get(field) for field in SUMMARY_FIELDS] + [json.dumps(result)]
+            )
+            # Same transaction, so the aggregates never disagree with the results
+            self._add_progress(conn, result)
+
+    def query(self, language=None, since=None, limit=100, offset=0, compact=False):
+        clauses, params = [], []
+        if language:
+            clauses.append("language = ?")
+            params.append(language)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = ", ".join(SUMMARY_FIELDS) if compact else "payload"
+        rows = self._conn().execute(
+            f"SELECT {columns} FROM results {where} ORDER BY timestamp, id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        if compact:
+            return [dict(zip(SUMMARY_FIELDS, row)) for row in rows]
+        return [json.loads(row[0]) for row in rows]
+
+    def progress(self, language, period="day", points=90, user=""):
+        # Primary-key range scan of at most `points` rows, however long the history
+        rows = self._conn().execute(
+            "SELECT bucket, tests, band_sum, band_best, scored, fluency_sum, grammar_sum, vocabulary_sum,"
+            " pronunciation_sum FROM progress WHERE user = ? AND language = ? AND period = ?"
+            " ORDER BY bucket DESC LIMIT ?",
+            [user, language, period, points]
+        ).fetchall()
+        return [progress_point(*row) for row in reversed(rows)]
+
+class JSONLStore(ResultsStore):
+    # Append-only log; one JSON document per line, never rewritten
+    def __init__(self, path=RESULTS_JSONL):
+        self.path = path
+        self._lock = threading.Lock()
+        # Aggregates kept in memory and brought up to date by reading only the lines appended since
+        # the last read (by this process or any other)
+        self._progress = {}
+        self._progress_offset = 0
+        self._progress_lock = threading.Lock()
+
+    def append(self, result):
+        line = (json.dumps(result) + "\n").encode("utf-8")
+        with self._lock:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def query(self, language=None, since=None, limit=100, offset=0, compact=False):
+        items = []
+        skipped = 0
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return items
+        with f:
+            for line in f:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                if language and result.get("language") != language:
+                    continue
+                if since and result.get("timestamp", "") < since:
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                items.append({field: result.get(field) for field in SUMMARY_FIELDS} if compact else result)
+                if len(items) >= limit:
+                    break
+        return items
+
+    def _catch_up(self):
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._progress_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # A line still being written; read it next time
+                self._progress_offset += len(line)
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                for period in PERIODS:
+                    key, *values = progress_row(result, period)
+                    buckets = self._progress.setdefault(key[:3], {})
+                    current = buckets.get(key[3])
+                    if current is not None:
+                        best = max(current[2], values[2])
+                        values = [a + b for a, b in zip(current, values)]
+                        values[2] = best
+                    buckets[key[3]] = values
+
+    def progress(self, language, period="day", points=90, user=""):
+        with self._progress_lock:
+            self._catch_up()
+            buckets = self._progress.get((user, language, period), {})
+            latest = sorted(buckets)[-points:]
+            return [progress_point(bucket, *buckets[bucket]) for bucket in latest]
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = JSONLStore() if RESULTS_STORE == "jsonl" else SQLiteStore()
+                store.migrate_history_json()
+                _store = store
+    return _store
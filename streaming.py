@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import numpy as np
+import evaluate
+import metrics
+from audio import SAMPLE_RATE
+from grammar import check_sentences
+from models import get_grammar_tool
+from pipeline import score_transcript, timed
+from store import get_store
+from transcribe import get_backend
+from utils import get_language_config, split_sentences, speech_rate
+from vad import detect_pauses, shift_timestamps
+from config import STREAM_STEP_SECONDS, STREAM_HOLDBACK_SECONDS, STREAM_WINDOW_SECONDS, MAX_AUDIO_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class StreamingSession:
+    # Incremental transcription over a sliding window. Segments that end at least
+    # STREAM_HOLDBACK_SECONDS before the newest audio are committed and never re-transcribed;
+    # the rest of the window is re-read on the next step as more audio arrives.
+    def __init__(self, language, sample_rate=SAMPLE_RATE, encoding="pcm_f32le", profile=None):
+        if encoding not in ("pcm_f32le", "pcm_s16le"):
+            raise ValueError(f"Unsupported encoding: {encoding}")
+        self.language = language
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.backend = get_backend(profile)
+        self.filler_matcher = get_language_config(language)["filler_matcher"]
+        # Received audio lives in the first _length samples of a buffer that doubles when full, so
+        # each chunk is copied once rather than the whole stream on every chunk
+        self._buffer = np.zeros(int(STREAM_WINDOW_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        self._length = 0
+        self.committed_until = 0.0
+        self.transcribed_until = 0.0
+        self.segments = []
+        self.pauses = []
+        self.checked_sentences = 0
+        self.timings = {}
+
+    @property
+    def audio(self):
+        # A view: appends write past its end and a grown buffer leaves it in place, so windows
+        # being transcribed are never changed under the transcriber
+        return self._buffer[:self._length]
+
+    @property
+    def duration(self):
+        return self._length / SAMPLE_RATE
+
+    def feed(self, data):
+        if self.encoding == "pcm_s16le":
+            samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        else:
+            samples = np.frombuffer(data, dtype=np.float32)
+        if self.sample_rate != SAMPLE_RATE and len(samples):
+            # Linear resampling is enough for speech recognition input
+            positions = np.arange(0, len(samples), self.sample_rate / SAMPLE_RATE)
+            samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        end = self._length + len(samples)
+        if end > MAX_AUDIO_SECONDS * SAMPLE_RATE:
+            raise ValueError(f"Audio exceeds {MAX_AUDIO_SECONDS} second limit")
+        if end > len(self._buffer):
+            grown = np.zeros(max(end, 2 * len(self._buffer)), dtype=np.float32)
+            grown[:self._length] = self._buffer[:self._length]
+            self._buffer = grown
+        self._buffer[self._length:end] = samples
+        self._length = end
+
+    def due(self):
+        return self.duration - self.transcribed_until >= STREAM_STEP_SECONDS
+
+    def _transcribe_window(self, final):
+        end = self.duration
+        start = max(self.committed_until, end - STREAM_WINDOW_SECONDS) if not final else self.committed_until
+        window = self.audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+        self.transcribed_until = end
+        if len(window) < SAMPLE_RATE * 0.1:
+            return []
+        _, segments = self.backend.transcribe(window, self.language)
+        shift_timestamps(segments, start)
+        if final:
+            return segments
+        stable_until = end - STREAM_HOLDBACK_SECONDS
+        stable = [s for s in segments if s["end"] <= stable_until]
+        if not stable and end - start >= STREAM_WINDOW_SECONDS and len(segments) > 1:
+            # Window is full; commit everything but the last segment so it can slide
+            stable = segments[:-1]
+        return stable
+
+    def _events_for(self, segments):
+        events = []
+        if not segments:
+            return events
+        # Pauses among the new words, plus the gap back to the last committed word
+        start = self.segments[-1]["end"] if self.segments else segments[0]["start"]
+        span = self.audio[int(start * SAMPLE_RATE):int(segments[-1]["end"] * SAMPLE_RATE)]
+        anchor = [{"start": start, "end": start, "words": [{"start": start, "end": start}]}] if self.segments else []
+        for pause in detect_pauses(span, anchor + segments, offset=start):
+            self.pauses.append(pause)
+            events.append(dict(pause, type="pause"))
+
+        for found in self.filler_matcher.find_segments(segments):
+            events.extend(dict(filler, type="filler") for filler in found)
+        return events
+
+    def _stats(self):
+        return {
+            "type": "stats",
+            "duration": round(self.duration, 2),
+            "words": sum(len(s["text"].split()) for s in self.segments),
+            "speech_rate": round(speech_rate(self.segments), 2),
+            "fluency": evaluate.fluency_score(self.segments, self.language, pauses=self.pauses)
+        }
+
+    def _prefetch_grammar(self):
+        # Check finished sentences now so the final grammar pass is served from the match cache
+        tool = get_grammar_tool(self.language)
+        sentences = split_sentences("".join(s["text"] for s in self.segments))
+        complete = sentences[:-1]
+        if tool is not None and len(complete) > self.checked_sentences:
+            check_sentences(tool, complete[self.checked_sentences:], self.language)
+            self.checked_sentences = len(complete)
+
+    def step(self, final=False):
+        segments = self._transcribe_window(final)
+        events = self._events_for(segments)
+        if segments:
+            self.segments.extend(segments)
+            self.committed_until = segments[-1]["end"]
+            events.insert(0, {
+                "type": "partial",
+                "segments": [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in segments]
+            })
+        events.append(self._stats())
+        if not final:
+            self._prefetch_grammar()
+        return events
+
+    def finish(self):
+        events = self.step(final=True)
+        transcription = "".join(s["text"] for s in self.segments)
+        result = score_transcript(transcription, self.segments, self.language, self.pauses, self.timings)
+        with timed(self.timings, "history"):
+            get_store().append(result)
+        self.timings["audio_seconds"] = round(self.duration, 2)
+        metrics.record_evaluation(self.timings)
+        events.append({"type": "final", "result": result, "timings": self.timings})
+        return events
+
+async def run_step(session, send, final=False):
+    # Returns False when the step failed; the client then gets an error event instead of results
+    try:
+        events = await asyncio.to_thread(session.finish if final else session.step)
+    except Exception as e:
+        logger.exception("Streaming step failed")
+        await send({"type": "error", "error": f"Transcription failed: {e}"})
+        return False
+    for event in events:
+        await send(event)
+    return True
@@ -0,0 +1,101 @@
+import logging
+from models import get_whisper_model, get_quantized_whisper_model, get_faster_whisper_model
+from config import TRANSCRIBE_BACKEND, TRANSCRIBE_PROFILE, WHISPER_MODEL, WHISPER_BATCHING
+
+logger = logging.getLogger(__name__)
+
+# Every backend returns (text, segments) where segments follow openai-whisper's layout:
+# {"id", "start", "end", "text", "words": [{"word", "start", "end", "probability"}]}
+
+class ReferenceBackend:
+    engine = "reference"
+
+    def __init__(self, size=WHISPER_MODEL):
+        self.size = size
+        self.tag = f"{self.engine}:{size}"
+
+    def _model(self):
+        return get_whisper_model(self.size)
+
+    def load(self):
+        model = self._model()
+        if WHISPER_BATCHING:
+            from batcher import batch_whisper_encoder
+            batch_whisper_encoder(model)
+        return model
+
+    def transcribe(self, audio, language):
+        result = self.load().transcribe(audio, language=language, word_timestamps=True, fp16=False)
+        return result["text"], result["segments"]
+
+class QuantizedBackend(ReferenceBackend):
+    # openai-whisper with Linear layers dynamically quantized to int8
+    engine = "int8"
+
+    def _model(self):
+        return get_quantized_whisper_model(self.size)
+
+class CTranslate2Backend(ReferenceBackend):
+    # faster-whisper (CTranslate2) with int8 weights
+    engine = "ctranslate2"
+
+    def load(self):
+        return get_faster_whisper_model(self.size)
+
+    def transcribe(self, audio, language):
+        segments, _ = self.load().transcribe(audio, language=language, word_timestamps=True, beam_size=5)
+        converted = []
+        for i, segment in enumerate(segments):
+            converted.append({
+                "id": i,
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "words": [
+                    {"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                    for w in (segment.words or [])
+                ]
+            })
+        return "".join(s["text"] for s in converted), converted
+
+ENGINES = {
+    "reference": ReferenceBackend,
+    "int8": QuantizedBackend,
+    "ctranslate2": CTranslate2Backend
+}
+
+# Speed/accuracy trade-off presets: profile -> (engine, model size)
+PROFILES = {
+    "fast": ("ctranslate2", "base"),
+    "balanced": ("ctranslate2", "small"),
+    "accurate": ("reference", "medium")
+}
+
+_backends = {}
+
+def _ctranslate2_available():
+    try:
+        import faster_whisper  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def get_backend(profile=None):
+    # Per-request profile, else the deployment profile, else TRANSCRIBE_BACKEND + WHISPER_MODEL
+    profile = profile or TRANSCRIBE_PROFILE
+    if profile:
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown transcription profile: {profile}")
+        engine, size = PROFILES[profile]
+    else:
+        engine, size = TRANSCRIBE_BACKEND, WHISPER_MODEL
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown transcription backend: {engine}")
+    key = (engine, size)
+    if key not in _backends:
+        # Resolved once per requested engine, so the fallback is logged once rather than per request
+        if engine == "ctranslate2" and not _ctranslate2_available():
+            logger.warning("faster-whisper is not installed; using the int8 PyTorch engine instead")
+            engine = "int8"
+        _backends[key] = ENGINES[engine](size)
+    return _backends[key]
@@ -1,275 +1,484 @@
-from transformers import pipeline
+import re
+import unicodedata
+from collections import Counter
+from types import MappingProxyType
+import numpy as np
+import metrics
+from config import COHERENCE_BATCH_SIZE, COHERENCE_ENGINE
+from models import get_coherence_model
 
-# Cache DistilBERT model
-_distilbert_model = None
+def split_sentences(text):
+    sentences = text.split('.')
+    return [s.strip() for s in sentences if s.strip()]
 
-def get_distilbert_model():
-    global _distilbert_model
-    if _distilbert_model is None:
-        _distilbert_model = pipeline("text-classification", model="distilbert-base-multilingual-cased", framework="pt")
-    return _distilbert_model
+def coherence_from_result(result):
+    # DistilBERT positivity is used as the coherence signal
+    return result['score'] if result['label'] == 'POSITIVE' else 1 - result['score']
 
-def get_language_config(language):
-    configs = {
-        "en": {
-            "fillers": ["um", "uh", "like", "you know"],
-            "target_wps": 2.0,
-            "feedback": {
-                "long_pause": {
-                    "issue": "Too many pauses",
-                    "suggestion": "Practice 30-second uninterrupted drills"
-                },
-                "filler": {
-                    "issue": "Filler word detected",
-                    "suggestion": "Try replacing filler words with brief pauses"
-                },
-                "coherence": {
-                    "issue": "Sentence lacks coherence",
-                    "suggestion": "Simplify your sentence structure, e.g., '{sentence}' could be clearer."
-                },
-                "repetitive_vocab": {
-                    "issue": "Repetitive use of words: {words}",
-                    "suggestion": "Use synonyms to diversify your vocabulary"
-                },
-                "speech_rate": {
-                    "issue": "Speech rate ({rate:.1f} words/sec) is too fast/slow",
-                    "suggestion": "Aim for a steady pace of around {target:.1f} words/sec"
-                }
+def speech_rate(timestamps):
+    total_duration = sum(t['end'] - t['start'] for t in timestamps)
+    word_count = sum(len(t['text'].split()) for t in timestamps)
+    return word_count / total_duration if total_duration > 0 else 0
+
+def _predict_pytorch(classifier, texts):
+    import torch
+    inputs = classifier.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="pt")
+    with torch.inference_mode():
+        best = classifier.model(**inputs).logits.softmax(dim=-1).max(dim=-1)
+    id2label = classifier.model.config.id2label
+    return [{"label": id2label[i], "score": score} for score, i in zip(best.values.tolist(), best.indices.tolist())]
+
+def _predict_onnx(classifier, texts):
+    inputs = classifier.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="np")
+    logits = classifier.session.run(["logits"], {
+        "input_ids": inputs["input_ids"].astype(np.int64),
+        "attention_mask": inputs["attention_mask"].astype(np.int64)
+    })[0]
+    probabilities = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probabilities /= probabilities.sum(axis=-1, keepdims=True)
+    best = probabilities.argmax(axis=-1)
+    return [{"label": classifier.id2label[int(i)], "score": float(probabilities[row, i])} for row, i in enumerate(best)]
+
+PREDICTORS = {"pytorch": _predict_pytorch, "onnx-int8": _predict_onnx}
+
+def coherence_scores(texts, batch_size=COHERENCE_BATCH_SIZE, engine=COHERENCE_ENGINE):
+    # One padded forward pass per batch instead of one pipeline call per text
+    classifier = get_coherence_model(engine)
+    predict = PREDICTORS[engine]
+    scores = [0.0] * len(texts)
+    # Length-sorted batches keep padding waste low
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        results = predict(classifier, [texts[i] for i in batch])
+        metrics.coherence_batches_total.inc()
+        metrics.coherence_texts_total.inc(len(batch))
+        for i, result in zip(batch, results):
+            scores[i] = coherence_from_result(result)
+    return scores
+
+_LANGUAGE_CONFIGS = {
+    "en": {
+        "fillers": ["um", "uh", "like", "you know"],
+        "target_wps": 2.0,
+        "labels": {"sentence": "Sentence {number}", "throughout": "Throughout",
+                   "slower": "slower", "faster": "faster", "corrected": "a corrected version"},
+        "feedback": {
+            "long_pause": {
+                "issue": "Noticeable pause detected",
+                "suggestion": "This pause might disrupt your flow. Try practicing with a timer for 30 seconds without stopping, but feel free to use short breaks (under 2 seconds) for natural pacing. Record again to see improvement!"
+            },
+            "filler": {
+                "issue": "Use of filler words like 'um' or 'uh'",
+                "suggestion": "Fillers can make your speech sound hesitant. Practice speaking slowly and pause instead of using 'um' or 'uh'. Try reading a short paragraph aloud without fillers!"
+            },
+            "grammar": {
+                "issue": "{message}",
+                "suggestion": "The word or phrase '{wrong}' is incorrect. {message}. Try using '{replacement}' instead. For example, change '{sentence}' to '{corrected}' or record again with this fix. Practice this to improve!"
+            },
+            "coherence": {
+                "issue": "Sentence may lack clarity or coherence",
+                "suggestion": "Your sentence might be unclear. Break it into smaller parts or add details, e.g., if you said '{sentence}', try 'I enjoy reading books'. Practice recording with simpler structures to enhance understanding. Give it another try!"
+            },
+            "repetitive_vocab": {
+                "issue": "Repetitive use of words: {words}",
+                "suggestion": "Repeating words like {words} can limit your expressiveness. Here are some ideas: {tips}. Practice using these in your next recording!"
+            },
+            "speech_rate": {
+                "issue": "Speech rate of {rate:.1f} words per second differs from the target",
+                "suggestion": "Your speech rate is a bit {adjustment} than the ideal {target:.1f} words per second. Practice by reading a text aloud with a metronome or timer, aiming for {target:.1f} words. Record again to check your progress!"
             }
         },
-        "zh": {
-            "fillers": ["那个", "嗯", "啊"],
-            "target_wps": 1.5,
-            "feedback": {
-                "long_pause": {
-                    "issue": "停顿过多",
-                    "suggestion": "练习30秒不间断说话"
-                },
-                "filler": {
-                    "issue": "检测到填充词",
-                    "suggestion": "尝试用短暂停顿替换填充词"
-                },
-                "coherence": {
-                    "issue": "句子缺乏连贯性",
-                    "suggestion": "简化句子结构，例如 '{sentence}' 可以更清晰"
-                },
-                "repetitive_vocab": {
-                    "issue": "重复使用词汇：{words}",
-                    "suggestion": "使用同义词丰富词汇"
-                },
-                "speech_rate": {
-                    "issue": "语速（每秒{rate:.1f}个词）过快/过慢",
-                    "suggestion": "目标是稳定的语速，约为每秒{target:.1f}个词"
-                }
+        # Vocabulary tips for frequently repeated words
+        "synonym_tips": {
+            "i": "Try 'me' or 'myself' in some places, or vary with 'my experience'.",
+            "the": "Use 'this' or 'that' to add variety.",
+            "is": "Switch with 'seems' or 'appears' for diversity.",
+            "": "Explore a thesaurus for alternatives."
+        }
+    },
+    "zh": {
+        "fillers": ["那个", "嗯", "啊"],
+        "target_wps": 1.5,
+        "labels": {"sentence": "第{number}句", "throughout": "全程",
+                   "slower": "慢", "faster": "快", "corrected": "修改后的说法"},
+        "feedback": {
+            "long_pause": {
+                "issue": "停顿过多",
+                "suggestion": "练习30秒不间断说话"
+            },
+            "filler": {
+                "issue": "检测到填充词",
+                "suggestion": "尝试用短暂停顿替换填充词"
+            },
+            "coherence": {
+                "issue": "句子缺乏连贯性",
+                "suggestion": "简化句子结构，例如 '{sentence}' 可以更清晰"
+            },
+            "repetitive_vocab": {
+                "issue": "重复使用词汇：{words}",
+                "suggestion": "使用同义词丰富词汇"
+            },
+            "speech_rate": {
+                "issue": "语速（每秒{rate:.1f}个词）过快/过慢",
+                "suggestion": "目标是稳定的语速，约为每秒{target:.1f}个词"
             }
-        },
-        "hi": {
-            "fillers": ["हम्म", "ऊँ", "जैसे"],
-            "target_wps": 1.8,
-            "feedback": {
-                "long_pause": {
-                    "issue": "बहुत अधिक रुकावटें",
-                    "suggestion": "30 सेकंड की निर्बाध ड्रिल का अभ्यास करें"
-                },
-                "filler": {
-                    "issue": "फिलर शब्द पाया गया",
-                    "suggestion": "फिलर शब्दों को संक्षिप्त रुकावटों से बदलें"
-                },
-                "coherence": {
-                    "issue": "वाक्य में सुसंगति की कमी",
-                    "suggestion": "वाक्य संरचना को सरल करें, उदाहरण के लिए '{sentence}' को और स्पष्ट करें"
-                },
-                "repetitive_vocab": {
-                    "issue": "शब्दों का बार-बार उपयोग: {words}",
-                    "suggestion": "पर्यायवाची शब्दों का उपयोग करके शब्दावली को विविध करें"
-                },
-                "speech_rate": {
-                    "issue": "बोलने की गति ({rate:.1f} शब्द/सेकंड) बहुत तेज/धीमी है",
-                    "suggestion": "लगभग {target:.1f} शब्द/सेकंड की स्थिर गति का लक्ष्य रखें"
-                }
+        }
+    },
+    "hi": {
+        "fillers": ["हम्म", "ऊँ", "जैसे"],
+        "target_wps": 1.8,
+        "labels": {"sentence": "वाक्य {number}", "throughout": "पूरे समय",
+                   "slower": "धीमी", "faster": "तेज़", "corrected": "सुधरा हुआ रूप"},
+        "feedback": {
+            "long_pause": {
+                "issue": "बहुत अधिक रुकावटें",
+                "suggestion": "30 सेकंड की निर्बाध ड्रिल का अभ्यास करें"
+            },
+            "filler": {
+                "issue": "फिलर शब्द पाया गया",
+                "suggestion": "फिलर शब्दों को संक्षिप्त रुकावटों से बदलें"
+            },
+            "coherence": {
+                "issue": "वाक्य में सुसंगति की कमी",
+                "suggestion": "वाक्य संरचना को सरल करें, उदाहरण के लिए '{sentence}' को और स्पष्ट करें"
+            },
+            "repetitive_vocab": {
+                "issue": "शब्दों का बार-बार उपयोग: {words}",
+                "suggestion": "पर्यायवाची शब्दों का उपयोग करके शब्दावली को विविध करें"
+            },
+            "speech_rate": {
+                "issue": "बोलने की गति ({rate:.1f} शब्द/सेकंड) बहुत तेज/धीमी है",
+                "suggestion": "लगभग {target:.1f} शब्द/सेकंड की स्थिर गति का लक्ष्य रखें"
             }
-        },
-        "es": {
-            "fillers": ["eh", "este", "pues"],
-            "target_wps": 2.0,
-            "feedback": {
-                "long_pause": {
-                    "issue": "Demasiadas pausas",
-                    "suggestion": "Practica ejercicios de 30 segundos sin interrupciones"
-                },
-                "filler": {
-                    "issue": "Palabra de relleno detectada",
-                    "suggestion": "Intenta reemplazar palabras de relleno con pausas breves"
-                },
-                "coherence": {
-                    "issue": "La oración carece de coherencia",
-                    "suggestion": "Simplifica la estructura de la oración, p.ej., '{sentence}' podría ser más clara"
-                },
-                "repetitive_vocab": {
-                    "issue": "Uso repetitivo de palabras: {words}",
-                    "suggestion": "Usa sinónimos para diversificar tu vocabulario"
-                },
-                "speech_rate": {
-                    "issue": "Velocidad del habla ({rate:.1f} palabras/seg) es demasiado rápida/lenta",
-                    "suggestion": "Apunta a un ritmo constante de alrededor de {target:.1f} palabras/seg"
-                }
+        }
+    },
+    "es": {
+        "fillers": ["eh", "este", "pues"],
+        "target_wps": 2.0,
+        "labels": {"sentence": "Oración {number}", "throughout": "En general",
+                   "slower": "lenta", "faster": "rápida", "corrected": "una versión corregida"},
+        "feedback": {
+            "long_pause": {
+                "issue": "Demasiadas pausas",
+                "suggestion": "Practica ejercicios de 30 segundos sin interrupciones"
+            },
+            "filler": {
+                "issue": "Palabra de relleno detectada",
+                "suggestion": "Intenta reemplazar palabras de relleno con pausas breves"
+            },
+            "coherence": {
+                "issue": "La oración carece de coherencia",
+                "suggestion": "Simplifica la estructura de la oración, p.ej., '{sentence}' podría ser más clara"
+            },
+            "repetitive_vocab": {
+                "issue": "Uso repetitivo de palabras: {words}",
+                "suggestion": "Usa sinónimos para diversificar tu vocabulario"
+            },
+            "grammar": {
+                "issue": "{message}",
+                "suggestion": "'{wrong}' no es correcto. {message}. Prueba con '{replacement}': cambia '{sentence}' por '{corrected}'"
+            },
+            "speech_rate": {
+                "issue": "Velocidad del habla ({rate:.1f} palabras/seg) es demasiado rápida/lenta",
+                "suggestion": "Apunta a un ritmo constante de alrededor de {target:.1f} palabras/seg"
             }
-        },
-        "fr": {
-            "fillers": ["euh", "ben", "tu sais"],
-            "target_wps": 1.9,
-            "feedback": {
-                "long_pause": {
-                    "issue": "Trop de pauses",
-                    "suggestion": "Pratiquez des exercices de 30 secondes sans interruption"
-                },
-                "filler": {
-                    "issue": "Mot de remplissage détecté",
-                    "suggestion": "Essayez de remplacer les mots de remplissage par de courtes pauses"
-                },
-                "coherence": {
-                    "issue": "La phrase manque de cohérence",
-                    "suggestion": "Simplifiez la structure de la phrase, par ex., '{sentence}' pourrait être plus claire"
-                },
-                "repetitive_vocab": {
-                    "issue": "Utilisation répétitive de mots : {words}",
-                    "suggestion": "Utilisez des synonymes pour diversifier votre vocabulaire"
-                },
-                "speech_rate": {
-                    "issue": "Vitesse de parole ({rate:.1f} mots/sec) trop rapide/lente",
-                    "suggestion": "Visez un rythme stable d’environ {target:.1f} mots/sec"
-                }
+        }
+    },
+    "fr": {
+        "fillers": ["euh", "ben", "tu sais"],
+        "target_wps": 1.9,
+        "labels": {"sentence": "Phrase {number}", "throughout": "Dans l'ensemble",
+                   "slower": "lente", "faster": "rapide", "corrected": "une version corrigée"},
+        "feedback": {
+            "long_pause": {
+                "issue": "Trop de pauses",
+                "suggestion": "Pratiquez des exercices de 30 secondes sans interruption"
+            },
+            "filler": {
+                "issue": "Mot de remplissage détecté",
+                "suggestion": "Essayez de remplacer les mots de remplissage par de courtes pauses"
+            },
+            "coherence": {
+                "issue": "La phrase manque de cohérence",
+                "suggestion": "Simplifiez la structure de la phrase, par ex., '{sentence}' pourrait être plus claire"
+            },
+            "repetitive_vocab": {
+                "issue": "Utilisation répétitive de mots : {words}",
+                "suggestion": "Utilisez des synonymes pour diversifier votre vocabulaire"
+            },
+            "grammar": {
+                "issue": "{message}",
+                "suggestion": "'{wrong}' est incorrect. {message}. Essayez '{replacement}' : remplacez '{sentence}' par '{corrected}'"
+            },
+            "speech_rate": {
+                "issue": "Vitesse de parole ({rate:.1f} mots/sec) trop rapide/lente",
+                "suggestion": "Visez un rythme stable d’environ {target:.1f} mots/sec"
             }
-        },
-        "ar": {
-            "fillers": ["أم", "يعني"],
-            "target_wps": 1.7,
-            "feedback": {
-                "long_pause": {
-                    "issue": "توقفات كثيرة جدًا",
-                    "suggestion": "تدرب على تمارين 30 ثانية دون انقطاع"
-                },
-                "filler": {
-                    "issue": "تم اكتشاف كلمة حشو",
-                    "suggestion": "حاول استبدال كلمات الحشو بتوقفات قصيرة"
-                },
-                "coherence": {
-                    "issue": "الجملة تفتقر إلى التماسك",
-                    "suggestion": "بسّط هيكلية الجملة، على سبيل المثال، '{sentence}' يمكن أن تكون أوضح"
-                },
-                "repetitive_vocab": {
-                    "issue": "تكرار استخدام الكلمات: {words}",
-                    "suggestion": "استخدم مرادفات لتنويع مفرداتك"
-                },
-                "speech_rate": {
-                    "issue": "سرعة الكلام ({rate:.1f} كلمة/ثانية) سريعة/بطيئة جدًا",
-                    "suggestion": "استهدف وتيرة ثابتة حوالي {target:.1f} كلمة/ثانية"
-                }
+        }
+    },
+    "ar": {
+        "fillers": ["أم", "يعني"],
+        "target_wps": 1.7,
+        "labels": {"sentence": "الجملة {number}", "throughout": "طوال الحديث",
+                   "slower": "أبطأ", "faster": "أسرع", "corrected": "صيغة مصححة"},
+        "feedback": {
+            "long_pause": {
+                "issue": "توقفات كثيرة جدًا",
+                "suggestion": "تدرب على تمارين 30 ثانية دون انقطاع"
+            },
+            "filler": {
+                "issue": "تم اكتشاف كلمة حشو",
+                "suggestion": "حاول استبدال كلمات الحشو بتوقفات قصيرة"
+            },
+            "coherence": {
+                "issue": "الجملة تفتقر إلى التماسك",
+                "suggestion": "بسّط هيكلية الجملة، على سبيل المثال، '{sentence}' يمكن أن تكون أوضح"
+            },
+            "repetitive_vocab": {
+                "issue": "تكرار استخدام الكلمات: {words}",
+                "suggestion": "استخدم مرادفات لتنويع مفرداتك"
+            },
+            "speech_rate": {
+                "issue": "سرعة الكلام ({rate:.1f} كلمة/ثانية) سريعة/بطيئة جدًا",
+                "suggestion": "استهدف وتيرة ثابتة حوالي {target:.1f} كلمة/ثانية"
             }
-        },
-        "bn": {
-            "fillers": ["উম", "মানে", "যেমন"],
-            "target_wps": 1.8,
-            "feedback": {
-                "long_pause": {
-                    "issue": "অনেক বেশি বিরতি",
-                    "suggestion": "30 সেকেন্ডের নিরবচ্ছিন্ন ড্রিল অনুশীলন করুন"
-                },
-                "filler": {
-                    "issue": "ফিলার শব্দ পাওয়া গেছে",
-                    "suggestion": "ফিলার শব্দগুলি সংক্ষিপ্ত বিরতি দিয়ে প্রতিস্থাপন করুন"
-                },
-                "coherence": {
-                    "issue": "বাক্যে সংগতির অভাব",
-                    "suggestion": "বাক্যের গঠন সরল করুন, উদাহরণস্বরূপ, '{sentence}' আরও স্পষ্ট হতে পারে"
-                },
-                "repetitive_vocab": {
-                    "issue": "শব্দের পুনরাবৃত্তি: {words}",
-                    "suggestion": "শব্দভাণ্ডার বৈচিত্র্যের জন্য প্রতিশব্দ ব্যবহার করুন"
-                },
-                "speech_rate": {
-                    "issue": "বক্তৃতার গতি ({rate:.1f} শব্দ/সেকেন্ড) খুব দ্রুত/ধীর",
-                    "suggestion": "প্রায় {target:.1f} শব্দ/সেকেন্ডের স্থির গতির লক্ষ্য রাখুন"
-                }
+        }
+    },
+    "bn": {
+        "fillers": ["উম", "মানে", "যেমন"],
+        "target_wps": 1.8,
+        "labels": {"sentence": "বাক্য {number}", "throughout": "সারাক্ষণ",
+                   "slower": "ধীর", "faster": "দ্রুত", "corrected": "সংশোধিত রূপ"},
+        "feedback": {
+            "long_pause": {
+                "issue": "অনেক বেশি বিরতি",
+                "suggestion": "30 সেকেন্ডের নিরবচ্ছিন্ন ড্রিল অনুশীলন করুন"
+            },
+            "filler": {
+                "issue": "ফিলার শব্দ পাওয়া গেছে",
+                "suggestion": "ফিলার শব্দগুলি সংক্ষিপ্ত বিরতি দিয়ে প্রতিস্থাপন করুন"
+            },
+            "coherence": {
+                "issue": "বাক্যে সংগতির অভাব",
+                "suggestion": "বাক্যের গঠন সরল করুন, উদাহরণস্বরূপ, '{sentence}' আরও স্পষ্ট হতে পারে"
+            },
+            "repetitive_vocab": {
+                "issue": "শব্দের পুনরাবৃত্তি: {words}",
+                "suggestion": "শব্দভাণ্ডার বৈচিত্র্যের জন্য প্রতিশব্দ ব্যবহার করুন"
+            },
+            "speech_rate": {
+                "issue": "বক্তৃতার গতি ({rate:.1f} শব্দ/সেকেন্ড) খুব দ্রুত/ধীর",
+                "suggestion": "প্রায় {target:.1f} শব্দ/সেকেন্ডের স্থির গতির লক্ষ্য রাখুন"
             }
-        },
-        "ru": {
-            "fillers": ["э", "ну", "типа"],
-            "target_wps": 1.9,
-            "feedback": {
-                "long_pause": {
-                    "issue": "Слишком много пауз",
-                    "suggestion": "Практикуйте 30-секундные упражнения без перерывов"
-                },
-                "filler": {
-                    "issue": "Обнаружено слово-наполнитель",
-                    "suggestion": "Попробуйте заменить слова-наполнители короткими паузами"
-                },
-                "coherence": {
-                    "issue": "Предложение лишено связности",
-                    "suggestion": "Упростите структуру предложения, например, '{sentence}' может быть яснее"
-                },
-                "repetitive_vocab": {
-                    "issue": "Повторяющееся использование слов: {words}",
-                    "suggestion": "Используйте синонимы для разнообразия лексики"
-                },
-                "speech_rate": {
-                    "issue": "Скорость речи ({rate:.1f} слов/сек) слишком быстрая/медленная",
-                    "suggestion": "Стремитесь к стабильной скорости около {target:.1f} слов/сек"
-                }
+        }
+    },
+    "ru": {
+        "fillers": ["э", "ну", "типа"],
+        "target_wps": 1.9,
+        "labels": {"sentence": "Предложение {number}", "throughout": "На протяжении всей речи",
+                   "slower": "медленнее", "faster": "быстрее", "corrected": "исправленный вариант"},
+        "feedback": {
+            "long_pause": {
+                "issue": "Слишком много пауз",
+                "suggestion": "Практикуйте 30-секундные упражнения без перерывов"
+            },
+            "filler": {
+                "issue": "Обнаружено слово-наполнитель",
+                "suggestion": "Попробуйте заменить слова-наполнители короткими паузами"
+            },
+            "coherence": {
+                "issue": "Предложение лишено связности",
+                "suggestion": "Упростите структуру предложения, например, '{sentence}' может быть яснее"
+            },
+            "repetitive_vocab": {
+                "issue": "Повторяющееся использование слов: {words}",
+                "suggestion": "Используйте синонимы для разнообразия лексики"
+            },
+            "grammar": {
+                "issue": "{message}",
+                "suggestion": "'{wrong}' — ошибка. {message}. Попробуйте '{replacement}': замените '{sentence}' на '{corrected}'"
+            },
+            "speech_rate": {
+                "issue": "Скорость речи ({rate:.1f} слов/сек) слишком быстрая/медленная",
+                "suggestion": "Стремитесь к стабильной скорости около {target:.1f} слов/сек"
             }
-        },
-        "pt": {
-            "fillers": ["hum", "tipo", "sabe"],
-            "target_wps": 2.0,
-            "feedback": {
-                "long_pause": {
-                    "issue": "Muitas pausas",
-                    "suggestion": "Pratique exercícios de 30 segundos sem interrupções"
-                },
-                "filler": {
-                    "issue": "Palavra de preenchimento detectada",
-                    "suggestion": "Tente substituir palavras de preenchimento por pausas curtas"
-                },
-                "coherence": {
-                    "issue": "A frase carece de coerência",
-                    "suggestion": "Simplifique a estrutura da frase, por ex., '{sentence}' poderia ser mais clara"
-                },
-                "repetitive_vocab": {
-                    "issue": "Uso repetitivo de palavras: {words}",
-                    "suggestion": "Use sinônimos para diversificar seu vocabulário"
-                },
-                "speech_rate": {
-                    "issue": "Velocidade da fala ({rate:.1f} palavras/seg) muito rápida/lenta",
-                    "suggestion": "Busque um ritmo constante de cerca de {target:.1f} palavras/seg"
-                }
+        }
+    },
+    "pt": {
+        "fillers": ["hum", "tipo", "sabe"],
+        "target_wps": 2.0,
+        "labels": {"sentence": "Frase {number}", "throughout": "Ao longo da fala",
+                   "slower": "lenta", "faster": "rápida", "corrected": "uma versão corrigida"},
+        "feedback": {
+            "long_pause": {
+                "issue": "Muitas pausas",
+                "suggestion": "Pratique exercícios de 30 segundos sem interrupções"
+            },
+            "filler": {
+                "issue": "Palavra de preenchimento detectada",
+                "suggestion": "Tente substituir palavras de preenchimento por pausas curtas"
+            },
+            "coherence": {
+                "issue": "A frase carece de coerência",
+                "suggestion": "Simplifique a estrutura da frase, por ex., '{sentence}' poderia ser mais clara"
+            },
+            "repetitive_vocab": {
+                "issue": "Uso repetitivo de palavras: {words}",
+                "suggestion": "Use sinônimos para diversificar seu vocabulário"
+            },
+            "grammar": {
+                "issue": "{message}",
+                "suggestion": "'{wrong}' está incorreto. {message}. Tente '{replacement}': troque '{sentence}' por '{corrected}'"
+            },
+            "speech_rate": {
+                "issue": "Velocidade da fala ({rate:.1f} palavras/seg) muito rápida/lenta",
+                "suggestion": "Busque um ritmo constante de cerca de {target:.1f} palavras/seg"
             }
-        },
-        "ur": {
-            "fillers": ["ہم", "مطلب", "جیسے"],
-            "target_wps": 1.8,
-            "feedback": {
-                "long_pause": {
-                    "issue": "بہت زیادہ وقفے",
-                    "suggestion": "30 سیکنڈ کے بغیر رکنے کے مشق کریں"
-                },
-                "filler": {
-                    "issue": "فلر لفظ پایا گیا",
-                    "suggestion": "فلر الفاظ کو مختصر وقفوں سے تبدیل کریں"
-                },
-                "coherence": {
-                    "issue": "جملے میں ربط کی کمی",
-                    "suggestion": "جملے کی ساخت کو آسان بنائیں، مثال کے طور پر، '{sentence}' کو مزید واضح کیا جا سکتا ہے"
-                },
-                "repetitive_vocab": {
-                    "issue": "الفاظ کا بار بار استعمال: {words}",
-                    "suggestion": "مترادفات استعمال کرکے اپنی لغت کو متنوع بنائیں"
-                },
-                "speech_rate": {
-                    "issue": "تقریر کی رفتار ({rate:.1f} الفاظ/سیکنڈ) بہت تیز/سست ہے",
-                    "suggestion": "تقریباً {target:.1f} الفاظ/سیکنڈ کی مستحکم رفتار کا ہدف رکھیں"
-                }
+        }
+    },
+    "ur": {
+        "fillers": ["ہم", "مطلب", "جیسے"],
+        "target_wps": 1.8,
+        "labels": {"sentence": "جملہ {number}", "throughout": "پوری گفتگو میں",
+                   "slower": "سست", "faster": "تیز", "corrected": "درست شکل"},
+        "feedback": {
+            "long_pause": {
+                "issue": "بہت زیادہ وقفے",
+                "suggestion": "30 سیکنڈ کے بغیر رکنے کے مشق کریں"
+            },
+            "filler": {
+                "issue": "فلر لفظ پایا گیا",
+                "suggestion": "فلر الفاظ کو مختصر وقفوں سے تبدیل کریں"
+            },
+            "coherence": {
+                "issue": "جملے میں ربط کی کمی",
+                "suggestion": "جملے کی ساخت کو آسان بنائیں، مثال کے طور پر، '{sentence}' کو مزید واضح کیا جا سکتا ہے"
+            },
+            "repetitive_vocab": {
+                "issue": "الفاظ کا بار بار استعمال: {words}",
+                "suggestion": "مترادفات استعمال کرکے اپنی لغت کو متنوع بنائیں"
+            },
+            "speech_rate": {
+                "issue": "تقریر کی رفتار ({rate:.1f} الفاظ/سیکنڈ) بہت تیز/سست ہے",
+                "suggestion": "تقریباً {target:.1f} الفاظ/سیکنڈ کی مستحکم رفتار کا ہدف رکھیں"
             }
         }
     }
-    return configs.get(language, configs["en"])  # Default to English
\ No newline at end of file
+}
+
+# Scripts written without spaces between words; Whisper splits them into per-character words
+UNSPACED_LANGUAGES = {"zh"}
+
+def _mark_ranges(limit=0xFFFF):
+    # Character-class ranges of the combining marks (Unicode category M) in the Basic Multilingual
+    # Plane, which holds every supported script. \w leaves them out, but Devanagari and Bengali vowel
+    # signs are part of the word: stripping them turns "जैसे" into "जस", which also matches "जिस".
+    ranges, start = [], None
+    for code in range(limit + 2):
+        mark = code <= limit and unicodedata.category(chr(code)).startswith("M")
+        if mark and start is None:
+            start = code
+        elif not mark and start is not None:
+            ranges.append(f"{chr(start)}-{chr(code - 1)}" if code - 1 > start else chr(start))
+            start = None
+    return "".join(ranges)
+
+# Word characters: \w plus combining marks
+_MARKS = _mark_ranges()
+_WORD_CHAR = rf"[\w{_MARKS}]"
+_PUNCTUATION = re.compile(rf"[^\w\s'{_MARKS}]+")
+
+def normalize_word(word):
+    return _PUNCTUATION.sub("", word).strip().casefold()
+
+class FillerMatcher:
+    # All fillers of a language compiled into one alternation (longest first), matched only at word
+    # boundaries so "like" does not fire inside "likely"
+    def __init__(self, fillers, spaced=True):
+        # A filler the normalizer would change (e.g. lose a vowel sign) could match other words
+        altered = [filler for filler in fillers if normalize_word(filler) != filler.casefold()]
+        if altered:
+            raise ValueError(f"Fillers change under normalization: {altered}")
+        self.spaced = spaced
+        alternatives = "|".join(
+            r"\s+".join(re.escape(part) for part in normalize_word(filler).split())
+            for filler in sorted(fillers, key=len, reverse=True)
+        )
+        self.pattern = re.compile(rf"(?<!{_WORD_CHAR})(?:{alternatives})(?!{_WORD_CHAR})" if spaced
+                                  else f"(?:{alternatives})")
+
+    def count(self, text):
+        return sum(1 for _ in self.pattern.finditer(normalize_word(text)))
+
+    def find_words(self, words):
+        # Whisper word timestamps -> [{"word", "start", "end"}] per filler occurrence
+        joiner = " " if self.spaced else ""
+        tokens = [normalize_word(w["word"]) for w in words]
+        owners, text = [], ""
+        for i, token in enumerate(tokens):
+            if not token:
+                continue
+            if text:
+                text += joiner
+                owners.extend([i] * len(joiner))
+            text += token
+            owners.extend([i] * len(token))
+        found = []
+        for match in self.pattern.finditer(text):
+            first, last = owners[match.start()], owners[match.end() - 1]
+            found.append({"word": match.group(), "start": words[first]["start"], "end": words[last]["end"]})
+        return found
+
+    def find_segments(self, segments):
+        # Occurrences per segment; segments without word timestamps are matched on their text
+        found = []
+        for segment in segments:
+            words = segment.get("words") or []
+            if words:
+                found.append(self.find_words(words))
+            else:
+                found.append([{"word": m.group(), "start": segment["start"], "end": segment["end"]}
+                              for m in self.pattern.finditer(normalize_word(segment["text"]))])
+        return found
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _compile_config(language, config):
+    compiled = dict(config)
+    compiled["filler_matcher"] = FillerMatcher(config["fillers"], spaced=language not in UNSPACED_LANGUAGES)
+    return _freeze(compiled)
+
+# Built once at import; read-only so callers can share them
+LANGUAGE_CONFIGS = MappingProxyType({
+    language: _compile_config(language, config) for language, config in _LANGUAGE_CONFIGS.items()
+})
+
+def get_language_config(language):
+    return LANGUAGE_CONFIGS.get(language, LANGUAGE_CONFIGS["en"])  # Default to English
+
+class TranscriptAnalysis:
+    # Tokenizes, sentence-splits and counts a transcript once; shared by the scorers and feedback
+    def __init__(self, transcription, timestamps, language):
+        self.transcription = transcription
+        self.timestamps = timestamps
+        self.language = language
+        self.config = get_language_config(language)
+        self.sentences = split_sentences(transcription)
+        self.words = transcription.lower().split()
+        self.word_counts = Counter(self.words)
+        self.words_per_second = speech_rate(timestamps)
+        # Filler occurrences per segment, from word timestamps
+        self.segment_fillers = self.config["filler_matcher"].find_segments(timestamps)
+
+    @property
+    def fillers(self):
+        return [filler for found in self.segment_fillers for filler in found]
+
+    def repeated_words(self, share=0.1):
+        return [word for word, count in self.word_counts.items() if count > len(self.words) * share]
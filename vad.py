@@ -0,0 +1,87 @@
+import numpy as np
+from audio import SAMPLE_RATE
+from config import PAUSE_MIN_SECONDS, VAD_MARGIN_DB, VAD_FLOOR_DB
+
+# 30 ms analysis frames every 10 ms
+FRAME_SECONDS = 0.03
+HOP_SECONDS = 0.01
+
+def frame_energy_db(samples, sample_rate=SAMPLE_RATE):
+    # Mean power per frame from a cumulative sum of squares; one pass over the waveform
+    frame = int(FRAME_SECONDS * sample_rate)
+    hop = int(HOP_SECONDS * sample_rate)
+    if len(samples) < frame:
+        samples = np.pad(samples, (0, frame - len(samples)))
+    power = np.concatenate(([0.0], np.cumsum(np.square(samples, dtype=np.float64))))
+    starts = np.arange(0, len(samples) - frame + 1, hop)
+    energy = (power[starts + frame] - power[starts]) / frame
+    return 10 * np.log10(energy + 1e-12)
+
+def speech_mask(samples, sample_rate=SAMPLE_RATE):
+    db = frame_energy_db(samples, sample_rate)
+    noise, peak = np.percentile(db, 10), db.max()
+    # Adaptive threshold above the noise floor, but never so high that all speech counts as silence
+    threshold = max(VAD_FLOOR_DB, min(noise + VAD_MARGIN_DB, peak - VAD_MARGIN_DB))
+    return db > threshold
+
+def _runs(mask):
+    # (start, end) frame indices of each run of True values
+    edges = np.diff(np.concatenate(([False], mask, [False])).astype(np.int8))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+def silent_intervals(samples, min_silence=PAUSE_MIN_SECONDS, sample_rate=SAMPLE_RATE):
+    starts, ends = _runs(~speech_mask(samples, sample_rate))
+    intervals = np.stack([starts * HOP_SECONDS, (ends - 1) * HOP_SECONDS + FRAME_SECONDS], axis=1)
+    return intervals[intervals[:, 1] - intervals[:, 0] >= min_silence]
+
+def trim_silence(samples, padding=0.2, sample_rate=SAMPLE_RATE):
+    # Drop leading/trailing silence before transcription; returns (samples, offset_seconds)
+    starts, ends = _runs(speech_mask(samples, sample_rate))
+    if len(starts) == 0:
+        return samples, 0.0
+    first = max(0, int((starts[0] * HOP_SECONDS - padding) * sample_rate))
+    last = min(len(samples), int(((ends[-1] - 1) * HOP_SECONDS + FRAME_SECONDS + padding) * sample_rate))
+    return samples[first:last], first / sample_rate
+
+def word_gaps(segments, min_gap=PAUSE_MIN_SECONDS):
+    # Gaps between consecutive words (or segments when Whisper gave no word timestamps)
+    words = [w for s in segments for w in s.get("words") or []]
+    items = words if words else segments
+    if len(items) < 2:
+        return np.zeros((0, 2))
+    starts = np.array([w["start"] for w in items], dtype=np.float64)
+    ends = np.array([w["end"] for w in items], dtype=np.float64)
+    gaps = np.stack([ends[:-1], starts[1:]], axis=1)
+    return gaps[gaps[:, 1] - gaps[:, 0] >= min_gap]
+
+def detect_pauses(samples, segments, min_pause=PAUSE_MIN_SECONDS, sample_rate=SAMPLE_RATE, offset=0.0):
+    # offset: time of samples[0] on the segments' timeline
+    gaps = word_gaps(segments, min_pause)
+    if samples is not None and len(gaps):
+        # Keep only gaps the waveform confirms as mostly silent
+        silent = silent_intervals(samples, 0.0, sample_rate) + offset
+        overlap = np.clip(
+            np.minimum(gaps[:, None, 1], silent[None, :, 1]) - np.maximum(gaps[:, None, 0], silent[None, :, 0]),
+            0, None
+        ).sum(axis=1)
+        gaps = gaps[overlap >= 0.5 * (gaps[:, 1] - gaps[:, 0])]
+    elif samples is not None and not segments:
+        # No transcript timing at all: fall back to silences between the first and last speech
+        silent = silent_intervals(samples, min_pause, sample_rate)
+        gaps = silent[(silent[:, 0] > 0) & (silent[:, 1] < len(samples) / sample_rate)] + offset
+    return [
+        {"start": round(float(start), 2), "end": round(float(end), 2), "duration": round(float(end - start), 2)}
+        for start, end in gaps
+    ]
+
+def shift_timestamps(segments, offset):
+    # Move segment and word times back onto the untrimmed recording's timeline
+    if not offset:
+        return segments
+    for segment in segments:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words") or []:
+            word["start"] += offset
+            word["end"] += offset
+    return segments